@@ -0,0 +1,279 @@
+# load generator + regression check for the credits layer.
+#
+#   bench_database_url=postgres://localhost/uwu_bench python -m bench.bench_credits --users 1000000
+#   python -m bench.bench_credits --save-baseline      # record the current numbers
+#
+# seeds bench_database_url (never point it at production, --reseed truncates the tables), then
+# replays a mixed workload through core's real helpers on a pool built like the bot's and reports
+# throughput, p50/p99 latency per op and pool wait time. exits 1 if a result is worse than
+# bench/baseline.json by more than --tolerance.
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+
+import asyncpg
+
+import core
+
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+default_mix = "get=50,add=20,sub=10,set=3,roles=15,leaderboard=2"
+
+
+def percentile(samples: list[float], p: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(int(len(ordered) * p), len(ordered) - 1)]
+
+
+def parse_mix(raw: str) -> dict[str, int]:
+    out: dict[str, int] = {}
+    for part in raw.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in ops:
+            raise SystemExit(f"unknown op in --mix: {name}")
+        out[name] = int(weight or 1)
+    return out
+
+
+class timed_pool:
+    # stands in for the asyncpg pool in core.bot.pool and records how long acquires wait
+    def __init__(self, pool: asyncpg.Pool):
+        self.pool = pool
+        self.waits: list[float] = []
+
+    async def acquire(self, *args, **kwargs):
+        started = time.perf_counter()
+        con = await self.pool.acquire(*args, **kwargs)
+        self.waits.append(time.perf_counter() - started)
+        return con
+
+    async def release(self, con, *args, **kwargs):
+        await self.pool.release(con, *args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self.pool, name)
+
+
+class user_picker:
+    # hot_share of calls go to the first hot_users ids, the rest are uniform
+    def __init__(self, users: int, hot_users: int, hot_share: float):
+        self.users = users
+        self.hot_users = max(1, min(hot_users, users))
+        self.hot_share = hot_share
+
+    def __call__(self) -> int:
+        if random.random() < self.hot_share:
+            return random.randint(1, self.hot_users)
+        return random.randint(1, self.users)
+
+
+ops = {
+    "get": lambda uid: core.get_credits(uid),
+    "add": lambda uid: core.add_credits(uid, random.randint(1, 100)),
+    "sub": lambda uid: core.sub_credits(uid, random.randint(1, 100)),
+    "set": lambda uid: core.set_credits(uid, random.randint(0, 10_000)),
+    "roles": lambda uid: core.get_user_roles(uid),
+    "leaderboard": lambda uid: core.leaderboard_rows(),
+}
+
+
+async def seed(dsn: str, users: int, whitelisted: int, reseed: bool) -> None:
+    await core.ensure_schema_at(dsn)
+    con = await asyncpg.connect(dsn)
+    try:
+        if reseed:
+            await con.execute("truncate credits, whitelist_roles, credit_ledger, credit_daily;")
+
+        have = await con.fetchval("select count(*) from credits;")
+        if have < users:
+            print(f"seeding {users - have:,} credit rows...")
+            await con.execute(
+                """
+                insert into credits (user_id, credits)
+                select g, (random() * 10000)::bigint
+                from generate_series(1, $1::bigint) as g
+                on conflict (user_id) do nothing;
+                """,
+                users,
+            )
+
+        await con.execute(
+            """
+            insert into whitelist_roles (user_id, role)
+            select g, (array['owners', 'manager', 'staff', 'tag_manager'])[1 + (g % 4)]
+            from generate_series(1, $1::bigint) as g
+            on conflict do nothing;
+            """,
+            whitelisted,
+        )
+        await con.execute("analyze credits; analyze whitelist_roles;")
+    finally:
+        await con.close()
+
+
+async def run_workload(args, pool: timed_pool) -> dict:
+    mix = parse_mix(args.mix)
+    names = list(mix.keys())
+    weights = [mix[n] for n in names]
+    pick_user = user_picker(args.users, args.hot_users, args.hot_share)
+
+    latencies: dict[str, list[float]] = {n: [] for n in names}
+    errors: dict[str, int] = {n: 0 for n in names}
+    stop_at = time.perf_counter() + args.duration
+
+    async def worker() -> None:
+        while time.perf_counter() < stop_at:
+            name = random.choices(names, weights)[0]
+            started = time.perf_counter()
+            try:
+                await ops[name](pick_user())
+            except Exception:
+                errors[name] += 1
+                continue
+            latencies[name].append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+    elapsed = time.perf_counter() - started
+
+    total = sum(len(v) for v in latencies.values())
+    return {
+        "throughput": total / elapsed,
+        "ops": {
+            n: {
+                "count": len(latencies[n]),
+                "errors": errors[n],
+                "p50_ms": percentile(latencies[n], 0.50) * 1000,
+                "p99_ms": percentile(latencies[n], 0.99) * 1000,
+            }
+            for n in names
+        },
+        "pool_wait_p50_ms": percentile(pool.waits, 0.50) * 1000,
+        "pool_wait_p99_ms": percentile(pool.waits, 0.99) * 1000,
+    }
+
+
+def print_report(result: dict) -> None:
+    print(f"throughput: {result['throughput']:.1f} ops/s")
+    print(f"pool wait: p50 {result['pool_wait_p50_ms']:.2f} ms | p99 {result['pool_wait_p99_ms']:.2f} ms")
+    for name, r in result["ops"].items():
+        print(
+            f"  {name:<12} n={r['count']:<8} err={r['errors']:<4} "
+            f"p50 {r['p50_ms']:8.2f} ms | p99 {r['p99_ms']:8.2f} ms"
+        )
+
+
+def regressions(result: dict, baseline: dict, tolerance: float) -> list[str]:
+    # small absolute slack so sub-millisecond noise doesn't fail the run
+    slack_ms = 2.0
+    out: list[str] = []
+
+    if result["throughput"] < baseline["throughput"] * (1 - tolerance):
+        out.append(f"throughput {result['throughput']:.1f} < baseline {baseline['throughput']:.1f}")
+
+    def worse(now: float, then: float) -> bool:
+        return now > then * (1 + tolerance) + slack_ms
+
+    if worse(result["pool_wait_p99_ms"], baseline["pool_wait_p99_ms"]):
+        out.append(f"pool wait p99 {result['pool_wait_p99_ms']:.2f} ms > baseline {baseline['pool_wait_p99_ms']:.2f} ms")
+
+    for name, r in result["ops"].items():
+        then = baseline.get("ops", {}).get(name)
+        if then is None:
+            continue
+        for key in ("p50_ms", "p99_ms"):
+            if worse(r[key], then[key]):
+                out.append(f"{name} {key} {r[key]:.2f} > baseline {then[key]:.2f}")
+    return out
+
+
+async def main_async(args) -> int:
+    if core.storage_backend != "postgres":
+        raise SystemExit("the bench drives the postgres store, unset storage_backend")
+    dsn = args.dsn or os.getenv("bench_database_url", "")
+    if not dsn:
+        raise SystemExit("set bench_database_url or pass --dsn")
+
+    # seed first, so the pool's connections are prepared against the finished schema
+    await seed(dsn, args.users, args.whitelisted, args.reseed)
+    raw_pool = await asyncpg.create_pool(dsn, **core.db_pool_kwargs(min_size=1, max_size=args.pool_size))
+    try:
+
+        pool = timed_pool(raw_pool)
+        core.bot.pool = pool
+        # the baseline is about the db path; the balance cache would answer the hot keys
+        if not args.balance_cache:
+            core.credits_cache = None
+        if args.coalesce_ms > 0:
+            core.bot.credit_agg = core.credit_aggregator(args.coalesce_ms, core.credits_coalesce_max_batch)
+
+        print(
+            f"running {args.duration}s, {args.concurrency} workers, pool max_size={args.pool_size}, "
+            f"{args.users:,} users, mix {args.mix}, balance cache {'on' if core.credits_cache else 'off'}"
+        )
+        result = await run_workload(args, pool)
+
+        if core.bot.credit_agg is not None:
+            await core.bot.credit_agg.close()
+    finally:
+        await raw_pool.close()
+
+    print_report(result)
+    if args.json_out:
+        with open(args.json_out, "w") as f:
+            json.dump(result, f, indent=2)
+
+    if args.save_baseline:
+        with open(BASELINE_PATH, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"saved baseline to {BASELINE_PATH}")
+        return 0
+
+    if not os.path.exists(BASELINE_PATH):
+        print("no baseline yet, run with --save-baseline to record one")
+        return 0
+
+    with open(BASELINE_PATH) as f:
+        baseline = json.load(f)
+    bad = regressions(result, baseline, args.tolerance)
+    if bad:
+        print("REGRESSED:")
+        for line in bad:
+            print(f"  {line}")
+        return 1
+    print("within baseline")
+    return 0
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description="credits layer load generator")
+    p.add_argument("--dsn", default="", help="postgres dsn (default: bench_database_url)")
+    p.add_argument("--users", type=int, default=1_000_000, help="credit rows to seed / pick from")
+    p.add_argument("--whitelisted", type=int, default=2_000, help="whitelist_roles rows to seed")
+    p.add_argument("--reseed", action="store_true", help="truncate the tables before seeding")
+    p.add_argument("--concurrency", type=int, default=200, help="concurrent simulated commands")
+    p.add_argument("--duration", type=float, default=30.0, help="seconds to run")
+    p.add_argument("--pool-size", type=int, default=core.db_pool_max, help="pool max_size (default db_pool_max)")
+    p.add_argument("--mix", default=default_mix, help=f"op weights (default {default_mix})")
+    p.add_argument("--hot-users", type=int, default=100, help="size of the hot key set")
+    p.add_argument("--hot-share", type=float, default=0.2, help="share of calls that hit the hot set")
+    p.add_argument("--coalesce-ms", type=float, default=0.0, help="run with the credit aggregator on")
+    p.add_argument("--balance-cache", action="store_true", help="keep the in-process balance cache on")
+    p.add_argument("--tolerance", type=float, default=0.2, help="allowed relative regression")
+    p.add_argument("--json-out", default="", help="also write the result here")
+    p.add_argument("--save-baseline", action="store_true", help="store this run as the baseline")
+    args = p.parse_args()
+    sys.exit(asyncio.run(main_async(args)))
+
+
+if __name__ == "__main__":
+    main()
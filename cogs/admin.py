@@ -0,0 +1,69 @@
+import os
+import tracemalloc
+
+import discord
+from discord import app_commands
+from discord.ext import commands
+
+from core import (
+    bot_cache_sizes,
+    credit_bot,
+    get_interaction_access_level,
+    low_memory,
+    process_rss_bytes,
+    tracemalloc_top,
+)
+
+
+def mb(n: int) -> str:
+    return f"{n / 1024 / 1024:.1f} MB"
+
+
+class admin_cog(commands.Cog):
+    debug = app_commands.Group(
+        name="debug",
+        description="bot diagnostics (owners only)",
+        allowed_installs=app_commands.AppInstallationType(guild=True, user=True),
+        allowed_contexts=app_commands.AppCommandContext(guild=True, dm_channel=True, private_channel=True),
+    )
+
+    def __init__(self, bot: credit_bot):
+        self.bot = bot
+
+    @debug.command(name="memory", description="memory use, top allocators and cache sizes")
+    @app_commands.describe(trace="start tracemalloc if it isn't running (adds overhead until restart)")
+    async def memory_cmd(self, interaction: discord.Interaction, trace: bool = False):
+        # owners only, hard stop
+        level = await get_interaction_access_level(interaction)
+        if level != "owners":
+            await interaction.response.send_message("you do not have permission to use this command.", ephemeral=True)
+            return
+
+        rss = process_rss_bytes()
+        lines = [
+            f"pid {os.getpid()}, profile: {'low memory' if low_memory else 'default'}",
+            f"rss: {mb(rss) if rss is not None else 'unknown'}",
+            "",
+            "caches:",
+        ]
+        for name, size in bot_cache_sizes().items():
+            lines.append(f"  {name:<24} {mb(size) if name.endswith('bytes') else f'{size:,}'}")
+
+        lines.append("")
+        if tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            lines.append(f"tracemalloc: {mb(current)} traced, {mb(peak)} peak")
+            for where, size, count in tracemalloc_top(10):
+                lines.append(f"  {mb(size):>9}  {count:>7,} blocks  {where[-60:]}")
+        elif trace:
+            tracemalloc.start()
+            lines.append("tracemalloc started, run this again in a while to see allocators.")
+        else:
+            lines.append("tracemalloc is off (pass trace:true, or set debug_tracemalloc=1).")
+
+        text = "\n".join(lines)
+        await interaction.response.send_message(f"```\n{text[:1900]}\n```", ephemeral=True)
+
+
+async def setup(bot: credit_bot):
+    await bot.add_cog(admin_cog(bot))
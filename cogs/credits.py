@@ -0,0 +1,189 @@
+from typing import Optional
+
+import discord
+from discord import app_commands
+from discord.ext import commands
+
+from core import (
+    add_credits,
+    charge_shared_limit,
+    credit_bot,
+    credit_history_rows,
+    format_credits,
+    get_credits,
+    leaderboard_rows,
+    make_embed,
+    period_leaderboard_rows,
+    require_access,
+    set_credits,
+    sub_credits,
+    wipe_credits,
+)
+
+
+class credits_cog(commands.Cog):
+    def __init__(self, bot: credit_bot):
+        self.bot = bot
+
+    @app_commands.command(name="credits", description="check credits for a user")
+    @app_commands.allowed_installs(guilds=True, users=True)
+    @app_commands.allowed_contexts(guilds=True, dms=True, private_channels=True)
+    @app_commands.describe(user="the user to check (defaults to you)")
+    async def credits_cmd(self, interaction: discord.Interaction, user: Optional[discord.User] = None):
+        if not await require_access(interaction, "credits", ephemeral=True):
+            return
+
+        target = user or interaction.user
+        amount = await get_credits(int(target.id))
+        e = make_embed(f"{target.name} credits", [f"**{format_credits(amount)} credits**"])
+        await interaction.response.send_message(embed=e, ephemeral=True)
+
+    @app_commands.command(name="creditsleaderboard", description="show credits leaderboard")
+    @app_commands.allowed_installs(guilds=True, users=True)
+    @app_commands.allowed_contexts(guilds=True, dms=True, private_channels=True)
+    async def creditsleaderboard_cmd(self, interaction: discord.Interaction):
+        if not await require_access(interaction, "creditsleaderboard", ephemeral=True):
+            return
+        if not await charge_shared_limit(interaction, "creditsleaderboard"):
+            return
+
+        rows = await leaderboard_rows()
+        if not rows:
+            e = make_embed("credits leaderboard", ["no one has credits yet."])
+            await interaction.response.send_message(embed=e, ephemeral=True)
+            return
+
+        lines: list[str] = []
+        for i, r in enumerate(rows, start=1):
+            uid = int(r["user_id"])
+            amt = int(r["credits"])
+            lines.append(f"{i}. <@{uid}> - {format_credits(amt)} credits")
+
+        e = make_embed("credits leaderboard", lines)
+        await interaction.response.send_message(embed=e, ephemeral=True)
+
+    @app_commands.command(name="creditstop", description="show who earned the most credits recently")
+    @app_commands.allowed_installs(guilds=True, users=True)
+    @app_commands.allowed_contexts(guilds=True, dms=True, private_channels=True)
+    @app_commands.describe(days="how many days back to count (default 7)")
+    async def creditstop_cmd(self, interaction: discord.Interaction, days: app_commands.Range[int, 1, 365] = 7):
+        if not await require_access(interaction, "creditstop", ephemeral=True):
+            return
+        if not await charge_shared_limit(interaction, "creditstop"):
+            return
+
+        rows = await period_leaderboard_rows(int(days))
+        title = f"top earners, last {days} days"
+        if not rows:
+            e = make_embed(title, ["no one earned credits in that time."])
+            await interaction.response.send_message(embed=e, ephemeral=True)
+            return
+
+        lines: list[str] = []
+        for i, r in enumerate(rows, start=1):
+            lines.append(f"{i}. <@{int(r['user_id'])}> - {format_credits(int(r['earned']))} credits")
+
+        e = make_embed(title, lines)
+        await interaction.response.send_message(embed=e, ephemeral=True)
+
+    @app_commands.command(name="credithistory", description="show a user's daily credit history")
+    @app_commands.allowed_installs(guilds=True, users=True)
+    @app_commands.allowed_contexts(guilds=True, dms=True, private_channels=True)
+    @app_commands.describe(user="the user to check (defaults to you)", days="how many days back (default 14)")
+    async def credithistory_cmd(
+        self,
+        interaction: discord.Interaction,
+        user: Optional[discord.User] = None,
+        days: app_commands.Range[int, 1, 365] = 14,
+    ):
+        if not await require_access(interaction, "credithistory", ephemeral=True):
+            return
+
+        target = user or interaction.user
+        rows = await credit_history_rows(int(target.id), int(days))
+        title = f"{target.name} credit history"
+        if not rows:
+            e = make_embed(title, [f"no credit changes in the last {days} days."])
+            await interaction.response.send_message(embed=e, ephemeral=True)
+            return
+
+        lines: list[str] = []
+        for r in rows:
+            lines.append(
+                f"`{r['day'].isoformat()}` +{format_credits(int(r['earned']))} / -{format_credits(int(r['spent']))}"
+            )
+
+        e = make_embed(title, lines)
+        await interaction.response.send_message(embed=e, ephemeral=True)
+
+    @app_commands.command(name="addcredits", description="add credits to a user")
+    @app_commands.allowed_installs(guilds=True, users=True)
+    @app_commands.allowed_contexts(guilds=True, dms=True, private_channels=True)
+    @app_commands.describe(user="the user to add credits to (defaults to you)", amount="amount to add")
+    async def addcredits_cmd(self, interaction: discord.Interaction, amount: int, user: Optional[discord.User] = None):
+        if not await require_access(interaction, "addcredits", ephemeral=True):
+            return
+
+        if amount <= 0:
+            await interaction.response.send_message("amount must be greater than 0.", ephemeral=True)
+            return
+
+        target = user or interaction.user
+        new_val = await add_credits(int(target.id), int(amount))
+        await interaction.response.send_message(
+            f"added {format_credits(amount)} credits to <@{int(target.id)}>. new total: {format_credits(new_val)}.",
+            ephemeral=True,
+        )
+
+    @app_commands.command(name="subcredits", description="subtract credits from a user")
+    @app_commands.allowed_installs(guilds=True, users=True)
+    @app_commands.allowed_contexts(guilds=True, dms=True, private_channels=True)
+    @app_commands.describe(user="the user to subtract credits from (defaults to you)", amount="amount to subtract")
+    async def subcredits_cmd(self, interaction: discord.Interaction, amount: int, user: Optional[discord.User] = None):
+        if not await require_access(interaction, "subcredits", ephemeral=True):
+            return
+
+        if amount <= 0:
+            await interaction.response.send_message("amount must be greater than 0.", ephemeral=True)
+            return
+
+        target = user or interaction.user
+        new_val = await sub_credits(int(target.id), int(amount))
+        await interaction.response.send_message(
+            f"subtracted {format_credits(amount)} credits from <@{int(target.id)}>. new total: {format_credits(new_val)}.",
+            ephemeral=True,
+        )
+
+    @app_commands.command(name="setcredits", description="set a user credits to an exact amount")
+    @app_commands.allowed_installs(guilds=True, users=True)
+    @app_commands.allowed_contexts(guilds=True, dms=True, private_channels=True)
+    @app_commands.describe(user="the user to set credits for", amount="new credits amount")
+    async def setcredits_cmd(self, interaction: discord.Interaction, user: discord.User, amount: int):
+        if not await require_access(interaction, "setcredits", ephemeral=True):
+            return
+
+        if amount < 0:
+            await interaction.response.send_message("amount cannot be negative.", ephemeral=True)
+            return
+
+        new_val = await set_credits(int(user.id), int(amount))
+        await interaction.response.send_message(
+            f"set <@{int(user.id)}> credits to {format_credits(new_val)}.",
+            ephemeral=True,
+        )
+
+    @app_commands.command(name="wipe", description="wipe all credits")
+    @app_commands.allowed_installs(guilds=True, users=True)
+    @app_commands.allowed_contexts(guilds=True, dms=True, private_channels=True)
+    async def wipe_cmd(self, interaction: discord.Interaction):
+        # wipe must be invisible
+        if not await require_access(interaction, "wipe", ephemeral=True):
+            return
+
+        await wipe_credits()
+
+        await interaction.response.send_message("wiped all credits.", ephemeral=True)
+
+
+async def setup(bot: credit_bot):
+    await bot.add_cog(credits_cog(bot))
@@ -0,0 +1,811 @@
+import asyncio
+import os
+from typing import Optional
+
+import discord
+from discord import app_commands
+from discord.ext import commands
+
+from core import (
+    apply_rank_changes,
+    charge_shared_limit,
+    credit_bot,
+    ensure_roblox_roles_loaded,
+    export_roster_csv,
+    get_interaction_access_level,
+    gzip_file,
+    is_digits,
+    load_rank_targets_table,
+    make_embed,
+    parse_rank_targets,
+    plan_rank_changes,
+    ranking_autocomplete,
+    rbx_membership,
+    rbx_prefetch,
+    rbx_rank_changes,
+    rbx_role_info_by_id,
+    rbx_user_label,
+    refresh_member_snapshot,
+    require_access,
+    roblox_api_key,
+    roblox_avatar_url,
+    roblox_get_membership,
+    roblox_iter_memberships,
+    roblox_members_in_role,
+    roblox_username_to_user_id,
+    roblox_usernames,
+    send_role_log,
+    start_bulk_job,
+    upload_limit_bytes,
+)
+
+
+class roblox_cog(commands.Cog):
+    def __init__(self, bot: credit_bot):
+        self.bot = bot
+
+    @app_commands.command(name="roles", description="list all roles in the roblox group")
+    @app_commands.allowed_installs(guilds=True, users=True)
+    @app_commands.allowed_contexts(guilds=True, dms=True, private_channels=True)
+    async def roles_cmd(self, interaction: discord.Interaction):
+        if not await require_access(interaction, "roles", ephemeral=False):
+            return
+
+        if not roblox_api_key:
+            await interaction.response.send_message("missing roblox_api_key in environment variables.", ephemeral=False)
+            return
+
+        if self.bot.rbx_http is None:
+            await interaction.response.send_message("roblox http client not ready.", ephemeral=False)
+            return
+
+        await interaction.response.defer(thinking=True)
+
+        try:
+            await ensure_roblox_roles_loaded(force=True)
+        except Exception as e:
+            await interaction.followup.send(f"failed: {e}", ephemeral=False)
+            return
+
+        if not self.bot._rbx_roles:
+            await interaction.followup.send("no roles returned.", ephemeral=False)
+            return
+
+        lines: list[str] = []
+        for r in self.bot._rbx_roles[:50]:
+            display = r.display_name or "unknown"
+            rank = str(r.rank) if r.rank else "unknown"
+            lines.append(f"- {display} | rank {rank} | role_id `{r.role_id}`")
+
+        e = make_embed("roblox group roles", lines)
+        await interaction.followup.send(embed=e, ephemeral=False)
+
+    @app_commands.command(name="rolecheck", description="check a roblox user's current group role")
+    @app_commands.allowed_installs(guilds=True, users=True)
+    @app_commands.allowed_contexts(guilds=True, dms=True, private_channels=True)
+    @app_commands.describe(id="roblox user id (or username)")
+    async def rolecheck_cmd(self, interaction: discord.Interaction, id: str):
+        # rolecheck must be invisible
+        if not await require_access(interaction, "rolecheck", ephemeral=True):
+            return
+
+        if not roblox_api_key:
+            await interaction.response.send_message("missing roblox_api_key in environment variables.", ephemeral=True)
+            return
+
+        if self.bot.rbx_http is None:
+            await interaction.response.send_message("roblox http client not ready.", ephemeral=True)
+            return
+
+        await interaction.response.defer(thinking=True, ephemeral=True)
+
+        raw = (id or "").strip()
+        target_user_id: Optional[int] = None
+        if raw.isdigit():
+            target_user_id = int(raw)
+        else:
+            target_user_id = await roblox_username_to_user_id(self.bot.rbx_http, raw)
+
+        if not target_user_id:
+            await interaction.followup.send("invalid id. provide a roblox user id or username.", ephemeral=True)
+            return
+
+        try:
+            await ensure_roblox_roles_loaded()
+        except Exception:
+            pass
+
+        try:
+            m = await roblox_get_membership(self.bot.rbx_http, int(target_user_id))
+        except Exception as e:
+            await interaction.followup.send(f"failed: {e}", ephemeral=True)
+            return
+
+        if not m:
+            await interaction.followup.send("user is not in the group.", ephemeral=True)
+            return
+
+        current_role_id = m.role_id
+
+        if current_role_id is None:
+            await interaction.followup.send(f"user `{target_user_id}` role: unknown", ephemeral=True)
+            return
+
+        name, rank = rbx_role_info_by_id(int(current_role_id))
+        await interaction.followup.send(
+            f"user `{target_user_id}` role: {name} (rank {rank}) | role_id `{current_role_id}`",
+            ephemeral=True,
+        )
+
+    @app_commands.command(name="role", description="rank a roblox user to a role in the group")
+    @app_commands.allowed_installs(guilds=True, users=True)
+    @app_commands.allowed_contexts(guilds=True, dms=True, private_channels=True)
+    @app_commands.describe(id="roblox user id (or username)", ranking="pick a role (autocomplete)")
+    @app_commands.autocomplete(ranking=ranking_autocomplete)
+    async def role_cmd(self, interaction: discord.Interaction, id: str, ranking: str):
+        if not await require_access(interaction, "role", ephemeral=False):
+            return
+
+        if not roblox_api_key:
+            await interaction.response.send_message("missing roblox_api_key in environment variables.", ephemeral=False)
+            return
+
+        if self.bot.rbx_http is None:
+            await interaction.response.send_message("roblox http client not ready.", ephemeral=False)
+            return
+
+        await interaction.response.defer(thinking=True)
+
+        raw = (id or "").strip()
+        if not is_digits(ranking):
+            await interaction.followup.send("invalid ranking selection.", ephemeral=False)
+            return
+
+        role_id = int(ranking)
+
+        # we set this exact role ourselves and nothing has changed it since: no lookups needed
+        if raw.isdigit() and rbx_rank_changes.known_user_role(int(raw)) == role_id:
+            new_name, _ = rbx_role_info_by_id(role_id)
+            await interaction.followup.send(f"`{raw}` is already `{new_name}`.", ephemeral=False)
+            return
+
+        # usually already looked up while the role was being picked
+        prefetched = await rbx_prefetch.take(int(interaction.user.id), raw)
+        if prefetched is not None and prefetched[1] is None:
+            # not found then, maybe they just joined; look again
+            prefetched = None
+
+        target_user_id: Optional[int] = None
+        m: Optional[rbx_membership] = None
+        if prefetched is not None:
+            target_user_id, m = prefetched
+        elif raw.isdigit():
+            target_user_id = int(raw)
+        else:
+            target_user_id = await roblox_username_to_user_id(self.bot.rbx_http, raw)
+
+        if not target_user_id:
+            await interaction.followup.send("invalid id. provide a roblox user id or username.", ephemeral=False)
+            return
+
+        try:
+            await ensure_roblox_roles_loaded()
+        except Exception:
+            pass
+
+        if prefetched is None:
+            if rbx_rank_changes.known_user_role(int(target_user_id)) == role_id:
+                new_name, _ = rbx_role_info_by_id(role_id)
+                await interaction.followup.send(f"`{target_user_id}` is already `{new_name}`.", ephemeral=False)
+                return
+            try:
+                m = await roblox_get_membership(self.bot.rbx_http, int(target_user_id))
+            except Exception as e:
+                await interaction.followup.send(f"failed: {e}", ephemeral=False)
+                return
+
+        if not m:
+            await interaction.followup.send("user is not in the group.", ephemeral=False)
+            return
+
+        membership_id = m.membership_id
+        if not membership_id:
+            await interaction.followup.send(f"could not read membership id. path: `{m.path}`", ephemeral=False)
+            return
+
+        current_role_id = m.role_id
+
+        base_role = self.bot._rbx_lowest_assignable_role_id
+
+        old_name = None
+        if current_role_id is not None:
+            old_name, _ = rbx_role_info_by_id(int(current_role_id))
+
+        try:
+            outcome = await rbx_rank_changes.set_role(
+                self.bot.rbx_http, membership_id, role_id, current_role_id, user_id=int(target_user_id)
+            )
+        except Exception as e:
+            await interaction.followup.send(f"failed: {e}", ephemeral=False)
+            return
+
+        new_name, _ = rbx_role_info_by_id(role_id)
+
+        if outcome.role_id != role_id:
+            # someone else's change to the same user went in right after ours
+            final_name, _ = rbx_role_info_by_id(outcome.role_id)
+            await interaction.followup.send(
+                f"a newer change to `{target_user_id}` landed at the same time, they are now `{final_name}`.",
+                ephemeral=False,
+            )
+            return
+
+        if not outcome.patched:
+            await interaction.followup.send(f"`{target_user_id}` is already `{new_name}`.", ephemeral=False)
+            return
+
+            # public response
+        await interaction.followup.send(
+            f"roled `{target_user_id}` to `{new_name}`",
+            ephemeral=False
+        )
+
+        # log message
+        who = rbx_user_label(target_user_id, await roblox_usernames(self.bot.rbx_http, [target_user_id]))
+        # if they already had a real role (not base), log it as a change
+        if (
+            base_role is not None
+            and current_role_id is not None
+            and int(current_role_id) != int(base_role)
+            and old_name
+        ):
+            log_msg = (
+                f"{interaction.user.mention} changed {who} "
+                f"from `{old_name}` to `{new_name}`"
+            )
+        else:
+            log_msg = (
+                f"{interaction.user.mention} has roled {who} "
+                f"to `{new_name}`"
+            )
+
+        await send_role_log(interaction, log_msg)
+
+    @app_commands.command(name="unrole", description="remove a user's rank (sets them to the lowest assignable group role)")
+    @app_commands.allowed_installs(guilds=True, users=True)
+    @app_commands.allowed_contexts(guilds=True, dms=True, private_channels=True)
+    @app_commands.describe(id="roblox user id (or username)")
+    async def unrole_cmd(self, interaction: discord.Interaction, id: str):
+        if not await require_access(interaction, "unrole", ephemeral=False):
+            return
+
+        if not roblox_api_key:
+            await interaction.response.send_message("missing roblox_api_key in environment variables.", ephemeral=False)
+            return
+
+        if self.bot.rbx_http is None:
+            await interaction.response.send_message("roblox http client not ready.", ephemeral=False)
+            return
+
+        await interaction.response.defer(thinking=True)
+
+        raw = (id or "").strip()
+        target_user_id: Optional[int] = None
+        if raw.isdigit():
+            target_user_id = int(raw)
+        else:
+            target_user_id = await roblox_username_to_user_id(self.bot.rbx_http, raw)
+
+        if not target_user_id:
+            await interaction.followup.send("invalid id. provide a roblox user id or username.", ephemeral=False)
+            return
+
+        # we already moved them to the base role and nothing has changed it since
+        known_base = self.bot._rbx_lowest_assignable_role_id
+        if known_base is not None and rbx_rank_changes.known_user_role(int(target_user_id)) == int(known_base):
+            await interaction.followup.send(f"`{target_user_id}` has no roles to clear.", ephemeral=False)
+            return
+
+        try:
+            await ensure_roblox_roles_loaded(force=True)
+        except Exception as e:
+            await interaction.followup.send(f"failed: {e}", ephemeral=False)
+            return
+
+        base_role = self.bot._rbx_lowest_assignable_role_id
+        if base_role is None:
+            await interaction.followup.send("could not determine lowest assignable role in group.", ephemeral=False)
+            return
+
+        try:
+            m = await roblox_get_membership(self.bot.rbx_http, int(target_user_id))
+        except Exception as e:
+            await interaction.followup.send(f"failed: {e}", ephemeral=False)
+            return
+
+        if not m:
+            await interaction.followup.send("user is not in the group.", ephemeral=False)
+            return
+
+        membership_id = m.membership_id
+        if not membership_id:
+            await interaction.followup.send(f"could not read membership id. path: `{m.path}`", ephemeral=False)
+            return
+
+        try:
+            outcome = await rbx_rank_changes.set_role(
+                self.bot.rbx_http, membership_id, int(base_role), m.role_id, user_id=int(target_user_id)
+            )
+        except Exception as e:
+            await interaction.followup.send(f"failed: {e}", ephemeral=False)
+            return
+
+        role_name, _rank = rbx_role_info_by_id(int(base_role))
+
+        if outcome.role_id != int(base_role):
+            final_name, _ = rbx_role_info_by_id(outcome.role_id)
+            await interaction.followup.send(
+                f"a newer change to `{target_user_id}` landed at the same time, they are now `{final_name}`.",
+                ephemeral=False,
+            )
+            return
+
+        if not outcome.patched:
+            await interaction.followup.send(f"`{target_user_id}` has no roles to clear.", ephemeral=False)
+            return
+
+        # public response (NOT the same as log)
+        await interaction.followup.send(f"successfully cleared roles for `{target_user_id}`", ephemeral=False)
+
+        # log message (minimalistic)
+        who = rbx_user_label(target_user_id, await roblox_usernames(self.bot.rbx_http, [target_user_id]))
+        log_msg = f"{interaction.user.mention} has unroled {who} and their role is now set to `{role_name}`"
+        await send_role_log(interaction, log_msg)
+
+    @app_commands.command(
+        name="user-to-id",
+        description="convert a roblox username to a user id"
+    )
+    @app_commands.allowed_installs(guilds=True, users=True)
+    @app_commands.allowed_contexts(guilds=True, dms=True, private_channels=True)
+    @app_commands.describe(username="roblox username")
+    async def user_to_id_cmd(self, interaction: discord.Interaction, username: str):
+        if not roblox_api_key:
+            await interaction.response.send_message(
+                "roblox api key is missing.",
+                ephemeral=True
+            )
+            return
+
+        assert self.bot.rbx_http is not None
+
+        await interaction.response.defer(ephemeral=False)
+
+        user_id = await roblox_username_to_user_id(self.bot.rbx_http, username)
+
+        if not user_id:
+            await interaction.followup.send(
+                f"could not find roblox user `{username}`.",
+                ephemeral=False
+            )
+            return
+
+        await interaction.followup.send(
+            f"roblox user `{username}` → id `{user_id}`",
+            ephemeral=False
+        )
+
+    @app_commands.command(name="inrole", description="list members in a roblox group role")
+    @app_commands.allowed_installs(guilds=True, users=True)
+    @app_commands.allowed_contexts(guilds=True, dms=True, private_channels=True)
+    @app_commands.describe(role="pick a role (autocomplete)")
+    @app_commands.autocomplete(role=ranking_autocomplete)
+    async def inrole_cmd(self, interaction: discord.Interaction, role: str):
+        if not await require_access(interaction, "whitelist"):
+            return
+
+        if not roblox_api_key:
+            await interaction.response.send_message("missing roblox api key.", ephemeral=True)
+            return
+
+        if not role.isdigit():
+            await interaction.response.send_message("invalid role.", ephemeral=False)
+            return
+
+        if not await charge_shared_limit(interaction, "inrole"):
+            return
+
+        await interaction.response.defer(ephemeral=False)
+
+        start_bulk_job()
+
+        role_id = int(role)
+
+        try:
+            await ensure_roblox_roles_loaded()
+        except Exception:
+            pass
+
+        # role name
+        role_name = "unknown role"
+        known = self.bot._rbx_roles_by_id.get(role_id)
+        if known is not None and known.display_name:
+            role_name = known.display_name
+
+        try:
+            members = await roblox_members_in_role(self.bot.rbx_http, role_id)
+        except Exception as e:
+            await interaction.followup.send(f"failed: {e}", ephemeral=False)
+            return
+
+        if not members:
+            await interaction.followup.send(f"no members found in **{role_name}**.", ephemeral=False)
+            return
+
+        # one lookup per 100 members
+        names = await roblox_usernames(self.bot.rbx_http, [m.user_id for m in members])
+
+        lines: list[str] = []
+
+        for m in members:
+            user_id = m.user_id
+            if user_id is None:
+                continue
+
+            # fix date
+            raw_time = m.update_time
+            date = "unknown"
+            if raw_time and not raw_time.startswith("0001-01-01"):
+                date = raw_time.split("T")[0]
+
+            # avatar url + profile url
+            avatar_url = await roblox_avatar_url(self.bot.rbx_http, user_id)
+            profile_url = f"https://www.roblox.com/users/{user_id}/profile"
+
+            icon = "icon"
+            if avatar_url:
+                icon = f"[icon]({avatar_url})"
+
+            name = names.get(user_id)
+            label = f"{name} ({user_id})" if name else str(user_id)
+            lines.append(f"{icon} [{label}]({profile_url}) - roled: `{date}`")
+
+        # chunk to avoid embed limit
+        chunks: list[list[str]] = []
+        cur: list[str] = []
+        cur_len = 0
+
+        for line in lines:
+            if cur_len + len(line) + 1 > 3500 and cur:
+                chunks.append(cur)
+                cur = []
+                cur_len = 0
+            cur.append(line)
+            cur_len += len(line) + 1
+
+        if cur:
+            chunks.append(cur)
+
+        for i, chunk in enumerate(chunks, start=1):
+            title = f"Members of {role_name}" if len(chunks) == 1 else f"Members of {role_name} ({i}/{len(chunks)})"
+            e = make_embed(title, chunk)
+            await interaction.followup.send(embed=e, ephemeral=False)
+
+    @app_commands.command(name="rolecensus", description="count members in every roblox group role")
+    @app_commands.allowed_installs(guilds=True, users=True)
+    @app_commands.allowed_contexts(guilds=True, dms=True, private_channels=True)
+    @app_commands.describe(refresh="re-crawl the group instead of using the saved snapshot")
+    async def rolecensus_cmd(self, interaction: discord.Interaction, refresh: bool = False):
+        if not await require_access(interaction, "rolecensus", ephemeral=False):
+            return
+
+        if not roblox_api_key:
+            await interaction.response.send_message("missing roblox_api_key in environment variables.", ephemeral=False)
+            return
+
+        if self.bot.rbx_http is None:
+            await interaction.response.send_message("roblox http client not ready.", ephemeral=False)
+            return
+
+        if not await charge_shared_limit(interaction, "rolecensus"):
+            return
+
+        await interaction.response.defer(thinking=True)
+
+        try:
+            await ensure_roblox_roles_loaded()
+        except Exception:
+            pass
+
+        snap = self.bot.rbx_snapshot
+        if refresh or snap is None:
+            start_bulk_job()
+            try:
+                snap = await refresh_member_snapshot()
+            except Exception as e:
+                await interaction.followup.send(f"failed while scanning: {e}", ephemeral=False)
+                return
+
+        counts = snap.role_counts()
+
+        def sort_key(item: tuple[int, int]):
+            role = self.bot._rbx_roles_by_id.get(item[0])
+            return -(role.rank or 0) if role is not None else 1
+
+        lines: list[str] = []
+        for rid, n in sorted(counts.items(), key=sort_key):
+            name, rank = rbx_role_info_by_id(rid)
+            lines.append(f"- {name} | rank {rank} | `{n:,}`")
+
+        lines.append("")
+        lines.append(f"total `{len(snap):,}` members, snapshot taken <t:{snap.taken_at}:R>")
+
+        e = make_embed("roblox group census", lines)
+        await interaction.followup.send(embed=e, ephemeral=False)
+
+    @app_commands.command(name="export-roster", description="export the whole roblox group as a csv file")
+    @app_commands.allowed_installs(guilds=True, users=True)
+    @app_commands.allowed_contexts(guilds=True, dms=True, private_channels=True)
+    @app_commands.describe(resume="continue an interrupted export instead of starting over (default true)")
+    async def export_roster_cmd(self, interaction: discord.Interaction, resume: bool = True):
+        if not await require_access(interaction, "export-roster", ephemeral=False):
+            return
+
+        if not roblox_api_key:
+            await interaction.response.send_message("missing roblox_api_key in environment variables.", ephemeral=False)
+            return
+
+        if self.bot.rbx_http is None:
+            await interaction.response.send_message("roblox http client not ready.", ephemeral=False)
+            return
+
+        # checked and taken with no await in between, so two invocations can't both get past
+        if self.bot._export_lock.locked():
+            await interaction.response.send_message("an export is already running.", ephemeral=True)
+            return
+        await self.bot._export_lock.acquire()
+
+        try:
+            await self.run_export(interaction, resume)
+        finally:
+            self.bot._export_lock.release()
+
+    async def run_export(self, interaction: discord.Interaction, resume: bool):
+        if not await charge_shared_limit(interaction, "export-roster"):
+            return
+
+        await interaction.response.defer(thinking=True)
+
+        start_bulk_job()
+
+        try:
+            await ensure_roblox_roles_loaded()
+        except Exception:
+            pass
+
+        try:
+            path, rows, resumed = await export_roster_csv(self.bot.rbx_http, resume=resume)
+        except Exception as e:
+            await interaction.followup.send(
+                f"export stopped: {e}. run `/export-roster` again to continue where it left off.",
+                ephemeral=False,
+            )
+            return
+
+        upload = path
+        if os.path.getsize(upload) > upload_limit_bytes:
+            upload = await asyncio.to_thread(gzip_file, path)
+        if os.path.getsize(upload) > upload_limit_bytes:
+            size_mb = os.path.getsize(upload) / 1024 / 1024
+            await interaction.followup.send(
+                f"exported `{rows}` members but the file is {size_mb:.1f} MB, too big to upload. "
+                f"it is saved on the bot host at `{upload}`.",
+                ephemeral=False,
+            )
+            return
+
+        note = " (resumed)" if resumed else ""
+        await interaction.followup.send(
+            f"exported `{rows}` members{note}.",
+            file=discord.File(upload, filename=os.path.basename(upload)),
+            ephemeral=False,
+        )
+        for p in {path, upload}:
+            try:
+                os.remove(p)
+            except OSError:
+                pass
+
+    @app_commands.command(
+        name="group-wipe",
+        description="reset everyone's role in the roblox group to the lowest role (owners only)"
+    )
+    @app_commands.allowed_installs(guilds=True, users=True)
+    @app_commands.allowed_contexts(guilds=True, dms=True, private_channels=True)
+    @app_commands.describe(confirm="type true to confirm")
+    async def group_wipe_cmd(self, interaction: discord.Interaction, confirm: bool):
+        # owners only, hard stop
+        level = await get_interaction_access_level(interaction)
+        if level != "owners":
+            await interaction.response.send_message("you do not have permission to use this command.", ephemeral=True)
+            return
+
+        if not confirm:
+            await interaction.response.send_message("set confirm to true to run `/group-wipe`.", ephemeral=True)
+            return
+
+        if not roblox_api_key:
+            await interaction.response.send_message("missing roblox_api_key in environment variables.", ephemeral=True)
+            return
+
+        assert self.bot.rbx_http is not None
+
+        if not await charge_shared_limit(interaction, "group-wipe"):
+            return
+
+        await interaction.response.defer(ephemeral=False)
+
+        start_bulk_job()
+
+        # make sure we know the lowest role
+        try:
+            await ensure_roblox_roles_loaded(force=True)
+        except Exception as e:
+            await interaction.followup.send(f"failed: {e}", ephemeral=False)
+            return
+
+        lowest = self.bot._rbx_lowest_assignable_role_id
+        if lowest is None:
+            await interaction.followup.send("could not determine lowest role in group.", ephemeral=False)
+            return
+
+        lowest_name, _ = rbx_role_info_by_id(int(lowest))
+
+        changed = 0
+        scanned = 0
+        failed = 0
+
+        try:
+            async for m in roblox_iter_memberships(self.bot.rbx_http):
+                scanned += 1
+
+                membership_id = m.membership_id
+                if not membership_id:
+                    failed += 1
+                    continue
+
+                current_role_id = m.role_id
+
+                # skip if already lowest
+                if current_role_id is not None and int(current_role_id) == int(lowest):
+                    continue
+
+                try:
+                    outcome = await rbx_rank_changes.set_role(
+                        self.bot.rbx_http, membership_id, int(lowest), current_role_id
+                    )
+                    if outcome.patched:
+                        changed += 1
+                except Exception:
+                    failed += 1
+
+        except Exception as e:
+            await interaction.followup.send(f"failed while scanning: {e}", ephemeral=False)
+            return
+
+        # public response
+        await interaction.followup.send(
+            f"group wipe complete. set `{changed}` users to `{lowest_name}`. scanned `{scanned}`. failed `{failed}`.",
+            ephemeral=False,
+        )
+
+        # log
+        await send_role_log(
+            interaction,
+            f"{interaction.user.mention} ran group wipe. set `{changed}` users to `{lowest_name}` (failed `{failed}`)",
+        )
+
+    @app_commands.command(name="reconcile", description="bring group ranks in line with a target list (owners only)")
+    @app_commands.allowed_installs(guilds=True, users=True)
+    @app_commands.allowed_contexts(guilds=True, dms=True, private_channels=True)
+    @app_commands.describe(
+        source="where the target ranks come from",
+        file="csv of user_id,role (role id or name), needed when source is file",
+        dry_run="only report what would change (default true)",
+    )
+    @app_commands.choices(
+        source=[
+            app_commands.Choice(name="rank_targets table", value="table"),
+            app_commands.Choice(name="uploaded file", value="file"),
+        ]
+    )
+    async def reconcile_cmd(
+        self,
+        interaction: discord.Interaction,
+        source: app_commands.Choice[str],
+        file: Optional[discord.Attachment] = None,
+        dry_run: bool = True,
+    ):
+        # owners only, hard stop
+        level = await get_interaction_access_level(interaction)
+        if level != "owners":
+            await interaction.response.send_message("you do not have permission to use this command.", ephemeral=True)
+            return
+
+        if not roblox_api_key:
+            await interaction.response.send_message("missing roblox_api_key in environment variables.", ephemeral=True)
+            return
+
+        if source.value == "file" and file is None:
+            await interaction.response.send_message("attach a file when source is file.", ephemeral=True)
+            return
+
+        assert self.bot.rbx_http is not None
+
+        if not await charge_shared_limit(interaction, "reconcile"):
+            return
+
+        await interaction.response.defer(ephemeral=False)
+
+        start_bulk_job()
+
+        try:
+            await ensure_roblox_roles_loaded(force=True)
+        except Exception as e:
+            await interaction.followup.send(f"failed: {e}", ephemeral=False)
+            return
+
+        bad = 0
+        if source.value == "file":
+            assert file is not None
+            if file.size > 5_000_000:
+                await interaction.followup.send("file is too big (max 5 MB).", ephemeral=False)
+                return
+            raw = await file.read()
+            targets, bad = parse_rank_targets(raw.decode("utf-8", errors="replace"))
+        else:
+            targets = await load_rank_targets_table()
+
+        # never hand out roles the group doesn't have
+        unknown = [uid for uid, rid in targets.items() if rid not in self.bot._rbx_roles_by_id]
+        for uid in unknown:
+            del targets[uid]
+        bad += len(unknown)
+
+        if not targets:
+            await interaction.followup.send(f"no valid targets (skipped `{bad}` bad rows).", ephemeral=False)
+            return
+
+        try:
+            changes, scanned, missing = await plan_rank_changes(self.bot.rbx_http, targets)
+        except Exception as e:
+            await interaction.followup.send(f"failed while scanning: {e}", ephemeral=False)
+            return
+
+        lines = [
+            f"targets `{len(targets)}` | scanned `{scanned}` | not in group `{missing}` | bad rows `{bad}`",
+            f"already correct `{len(targets) - missing - len(changes)}` | to change `{len(changes)}`",
+        ]
+
+        if dry_run:
+            names = await roblox_usernames(self.bot.rbx_http, [uid for _mid, uid, _frm, _to in changes[:20]])
+            for _mid, uid, frm, to in changes[:20]:
+                frm_name = rbx_role_info_by_id(frm)[0] if frm is not None else "unknown"
+                lines.append(f"- {rbx_user_label(uid, names)}: {frm_name} -> {rbx_role_info_by_id(to)[0]}")
+            if len(changes) > 20:
+                lines.append(f"... and `{len(changes) - 20}` more")
+            await interaction.followup.send(embed=make_embed("reconcile (dry run)", lines), ephemeral=False)
+            return
+
+        ok, failed = await apply_rank_changes(self.bot.rbx_http, changes)
+        lines.append(f"changed `{ok}` | failed `{failed}`")
+        await interaction.followup.send(embed=make_embed("reconcile complete", lines), ephemeral=False)
+
+        await send_role_log(
+            interaction,
+            f"{interaction.user.mention} ran reconcile from `{source.value}`. changed `{ok}` users (failed `{failed}`)",
+        )
+
+
+async def setup(bot: credit_bot):
+    await bot.add_cog(roblox_cog(bot))
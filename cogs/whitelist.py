@@ -0,0 +1,108 @@
+import discord
+from discord import app_commands
+from discord.ext import commands
+
+from core import (
+    credit_bot,
+    make_embed,
+    pretty_level,
+    require_access,
+    resolve_level_from_roles,
+    role_choices,
+    valid_roles,
+    whitelist_add,
+    whitelist_remove,
+    whitelist_rows,
+)
+
+
+class whitelist_cog(commands.Cog):
+    def __init__(self, bot: credit_bot):
+        self.bot = bot
+
+    @app_commands.command(name="whitelist", description="give a stored whitelist role to a user")
+    @app_commands.allowed_installs(guilds=True, users=True)
+    @app_commands.allowed_contexts(guilds=True, dms=True, private_channels=True)
+    @app_commands.describe(user="the user to whitelist", role="which role to add")
+    @app_commands.choices(role=role_choices())
+    async def whitelist_cmd(self, interaction: discord.Interaction, user: discord.User, role: app_commands.Choice[str]):
+        if not await require_access(interaction, "whitelist", ephemeral=True):
+            return
+
+        role_value = str(role.value).lower().strip()
+        if role_value not in valid_roles:
+            await interaction.response.send_message("invalid role.", ephemeral=True)
+            return
+
+        await whitelist_add(int(user.id), role_value)
+
+        await interaction.response.send_message(
+            f"granted `{role_value}` to {user.mention} meow",
+            ephemeral=False,
+        )
+
+    @app_commands.command(name="unwhitelist", description="remove all stored whitelist roles from a user")
+    @app_commands.allowed_installs(guilds=True, users=True)
+    @app_commands.allowed_contexts(guilds=True, dms=True, private_channels=True)
+    @app_commands.describe(user="the user to unwhitelist")
+    async def unwhitelist_cmd(self, interaction: discord.Interaction, user: discord.User):
+        if not await require_access(interaction, "unwhitelist", ephemeral=True):
+            return
+
+        removed = await whitelist_remove(int(user.id))
+
+        await interaction.response.send_message(
+            f"removed stored roles from <@{int(user.id)}>* (delete {removed}).",
+            ephemeral=True,
+        )
+
+    @app_commands.command(name="rankinglist", description="list everyone whitelisted in the bot")
+    @app_commands.allowed_installs(guilds=True, users=True)
+    @app_commands.allowed_contexts(guilds=True, dms=True, private_channels=True)
+    async def rankinglist_cmd(self, interaction: discord.Interaction):
+        # i’m making this owners only (same power level as whitelist/unwhitelist)
+        if not await require_access(interaction, "whitelist"):
+            return
+
+        await interaction.response.defer(ephemeral=False)
+
+        rows = await whitelist_rows()
+
+        if not rows:
+            await interaction.followup.send("no one is whitelisted.", ephemeral=False)
+            return
+
+        by_user: dict[int, set[str]] = {}
+        for r in rows:
+            uid = int(r["user_id"])
+            role = str(r["role"]).lower().strip()
+            by_user.setdefault(uid, set()).add(role)
+
+        # build lines
+        lines: list[str] = []
+        for uid, roles in sorted(by_user.items(), key=lambda x: x[0]):
+            level = resolve_level_from_roles(roles)
+            lines.append(f"• <@{uid}> | {uid} | {pretty_level(level)}")
+
+        # discord embed description limit is ~4096 chars, so chunk it
+        chunks: list[list[str]] = []
+        cur: list[str] = []
+        cur_len = 0
+        for line in lines:
+            if cur_len + len(line) + 1 > 3800 and cur:
+                chunks.append(cur)
+                cur = []
+                cur_len = 0
+            cur.append(line)
+            cur_len += len(line) + 1
+        if cur:
+            chunks.append(cur)
+
+        for i, chunk in enumerate(chunks, start=1):
+            title = "Whitelists to the bot" if len(chunks) == 1 else f"Whitelists to the bot ({i}/{len(chunks)})"
+            e = make_embed(title, chunk)
+            await interaction.followup.send(embed=e, ephemeral=False)
+
+
+async def setup(bot: credit_bot):
+    await bot.add_cog(whitelist_cog(bot))
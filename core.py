@@ -0,0 +1,3396 @@
+import asyncio
+import contextvars
+import csv
+import heapq
+import hmac
+import gzip
+import hashlib
+import io
+import json
+import logging
+import logging.handlers
+import mmap
+import os
+import random
+import shutil
+import sqlite3
+import struct
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from array import array
+from collections import Counter, OrderedDict, deque
+from contextlib import asynccontextmanager, contextmanager
+from datetime import date, datetime, timedelta, timezone
+from typing import Optional
+
+import asyncpg
+import discord
+import httpx
+from aiohttp import web
+from discord import app_commands
+from discord.ext import commands
+
+
+token = os.getenv("discord_token", "")
+# where credits / whitelist data lives: "postgres" (database_url) or "sqlite" (a local file)
+storage_backend = os.getenv("storage_backend", "postgres").strip().lower()
+sqlite_path = os.getenv("sqlite_path", "credits.sqlite3")
+database_url = os.getenv("database_url", "")
+# optional read replica for read-only credits/whitelist queries
+database_replica_url = os.getenv("database_replica_url", "")
+guild_id_raw = os.getenv("guild_id", "")
+owner_ids_raw = os.getenv("owner_ids", "")
+
+# roblox open cloud
+roblox_api_key = os.getenv("roblox_api_key", "").strip()
+print("roblox_api_key present:", bool(roblox_api_key))
+print("roblox_api_key length:", len(roblox_api_key))
+
+# fixed
+ROBLOX_GROUP_ID = "174571331"
+
+# logging channel
+LOG_CHANNEL_ID = 1466623945514942506
+
+embed_color = discord.Color.green()
+valid_roles = {"owners", "manager", "staff", "tag_manager"}
+
+ROBLOX_BASE = "https://apis.roblox.com/cloud/v2"
+ROBLOX_USERS = "https://users.roblox.com/v1"
+ROBLOX_THUMBNAILS = "https://thumbnails.roblox.com/v1"
+
+
+def env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, "").strip())
+    except Exception:
+        return default
+
+
+def env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, "").strip())
+    except Exception:
+        return default
+
+
+def env_bool(name: str) -> bool:
+    return os.getenv(name, "").strip().lower() in {"1", "true", "yes", "on"}
+
+
+# fast runtime: uvloop event loop + orjson decoding (both optional installs)
+fast_runtime = env_bool("fast_runtime")
+
+fast_json = None
+if fast_runtime:
+    try:
+        import orjson as fast_json
+    except ImportError:
+        print("fast_runtime: orjson not installed, using json")
+
+# low-memory profile: no gateway intents, no message/member caches, smaller bot-level caches.
+# the bot only answers interactions, which carry everything it needs
+low_memory = env_bool("low_memory")
+# start tracemalloc at boot so /debug memory can show allocators from the start (it costs memory)
+debug_tracemalloc = env_bool("debug_tracemalloc")
+
+# where the columnar group snapshot behind /rolecensus is kept between restarts
+roblox_snapshot_path = os.getenv("roblox_snapshot_path", "group_snapshot.bin")
+
+# /export-roster writes here; an interrupted export resumes from its checkpoint
+roster_export_dir = os.getenv("roster_export_dir", tempfile.gettempdir())
+# goes into the export file names so workers sharing a host and export dir don't overwrite each
+# other. keep it stable per worker (not the pid) so an export cut off by a restart can resume
+worker_id = os.getenv("worker_id", "").strip()
+# biggest attachment the bot may upload (discord's default limit)
+upload_limit_bytes = env_int("upload_limit_bytes", 10 * 1024 * 1024)
+
+# concurrent PATCHes when /reconcile applies a plan
+reconcile_concurrency = env_int("reconcile_concurrency", 8)
+
+# credit ledger: daily partitions created this many days ahead, detached after keep_days (0 = keep)
+credit_ledger_days_ahead = env_int("credit_ledger_days_ahead", 7)
+credit_ledger_keep_days = env_int("credit_ledger_keep_days", 0)
+
+# throttling: every user gets a bucket of throttle_user_burst tokens refilled at throttle_user_rate/s,
+# commands cost command_costs tokens (default 1)
+throttle_user_burst = env_float("throttle_user_burst", 12.0)
+throttle_user_rate = env_float("throttle_user_rate", 0.5)
+throttle_max_users = env_int("throttle_max_users", 2_000 if low_memory else 10_000)
+
+# http ingestion api for game servers (POST /credits/batch), off unless ingest_port is set.
+# binds to localhost by default; requests need "authorization: bearer <ingest_token>"
+ingest_host = os.getenv("ingest_host", "127.0.0.1")
+ingest_port = env_int("ingest_port", 0)
+ingest_token = os.getenv("ingest_token", "").strip()
+ingest_max_batch = env_int("ingest_max_batch", 1000)
+
+# http interactions mode: discord posts interactions to interactions_host:interactions_port/interactions
+# instead of the bot holding a gateway connection (0 = gateway). needs the app's public key
+interactions_port = env_int("interactions_port", 0)
+interactions_host = os.getenv("interactions_host", "0.0.0.0")
+discord_public_key = os.getenv("discord_public_key", "").strip()
+# with several workers behind a load balancer, let only one of them sync commands, run the
+# ledger maintenance and set ingest_port. the rest of the bot's state stays per worker: throttle
+# limits apply per worker (so they multiply), /role and /unrole only serialize within a worker,
+# and membership prefetches are only reused by the worker that started them
+skip_command_sync = env_bool("skip_command_sync")
+skip_ledger_maintenance = env_bool("skip_ledger_maintenance")
+
+# write-through balance cache for /credits reads: max users kept (0 = off), and seconds an entry
+# is trusted after it was filled, which bounds how long a change made outside this process can hide.
+# off by default in http interactions mode, where other workers write balances this one can't see
+credits_cache_size = env_int(
+    "credits_cache_size", 0 if interactions_port > 0 else 2_000 if low_memory else 10_000
+)
+credits_cache_ttl_s = env_float("credits_cache_ttl_s", 60.0)
+
+# credits write coalescing (0 = off, every add/sub is its own upsert)
+credits_coalesce_ms = env_float("credits_coalesce_ms", 0.0)
+credits_coalesce_max_batch = env_int("credits_coalesce_max_batch", 500)
+
+# pool sizing (primary and replica each), and how long an interaction may wait for a connection
+# before it gets a "busy" reply (0 = wait forever)
+db_pool_min = env_int("db_pool_min", 2)
+db_pool_max = env_int("db_pool_max", 5)
+db_acquire_timeout = env_float("db_acquire_timeout", 5.0)
+# pgbouncer in transaction mode can't keep prepared statements, so none are made
+db_pgbouncer = env_bool("db_pgbouncer")
+# sqlite: writes queue behind one writer task and are committed together, up to this many per commit
+sqlite_write_batch = env_int("sqlite_write_batch", 256)
+
+# how long to stay on the primary after the replica fails
+replica_retry_s = env_float("database_replica_retry_s", 30.0)
+replica_acquire_timeout = env_float("database_replica_acquire_timeout", 2.0)
+
+# roblox circuit breakers: consecutive failures before opening, seconds before a probe
+roblox_breaker_threshold = env_int("roblox_breaker_threshold", 5)
+roblox_breaker_cooldown_s = env_float("roblox_breaker_cooldown_s", 30.0)
+
+# per-request timeout, and the total time budget one interaction gets for all its roblox calls
+roblox_timeout_s = env_float("roblox_timeout_s", 25.0)
+roblox_deadline_s = env_float("roblox_deadline_s", 20.0)
+roblox_autocomplete_deadline_s = env_float("roblox_autocomplete_deadline_s", 2.5)
+# roblox requests in flight at once, and how many of those group-wide jobs may hold
+roblox_max_in_flight = env_int("roblox_max_in_flight", 16)
+roblox_bulk_max_in_flight = env_int("roblox_bulk_max_in_flight", 4)
+# /role autocomplete starts looking up the target's membership; the command uses it if it is this fresh
+roblox_prefetch_ttl_s = env_float("roblox_prefetch_ttl_s", 20.0)
+# user id -> username cache for listings and logs (names can change, so entries age out)
+roblox_name_cache_size = env_int("roblox_name_cache_size", 5_000 if low_memory else 50_000)
+roblox_name_ttl_s = env_float("roblox_name_ttl_s", 86400.0)
+# how long the role the bot last set on a membership is trusted for skipping no-op changes
+roblox_rank_known_ttl_s = env_float("roblox_rank_known_ttl_s", 30.0)
+# hedged reads: samples needed before hedging, and the max share of reads that may be hedged
+roblox_hedge_min_samples = env_int("roblox_hedge_min_samples", 20)
+roblox_hedge_max_ratio = env_float("roblox_hedge_max_ratio", 0.1)
+
+# on-disk cache for roblox metadata (roles list, avatars, username lookups) that survives restarts.
+# entries are served for their ttl, then revalidated with etag / last-modified. empty path = off
+roblox_http_cache_path = os.getenv("roblox_http_cache_path", "roblox_http_cache.sqlite3")
+roblox_cache_roles_s = env_float("roblox_cache_roles_s", 300.0)
+roblox_cache_avatar_s = env_float("roblox_cache_avatar_s", 3600.0)
+roblox_cache_username_s = env_float("roblox_cache_username_s", 86400.0)
+# entries nobody asked for in this long are dropped on startup
+roblox_cache_keep_s = env_float("roblox_cache_keep_s", 7 * 86400.0)
+
+# slow interaction log: span trees of sampled interactions slower than trace_slow_ms (0 = off)
+trace_slow_ms = env_float("trace_slow_ms", 0.0)
+trace_sample_rate = env_float("trace_sample_rate", 1.0)
+trace_log_path = os.getenv("trace_log_path", "slow_interactions.jsonl")
+trace_log_max_bytes = env_int("trace_log_max_bytes", 5_000_000)
+trace_log_backups = env_int("trace_log_backups", 3)
+
+
+def parse_owner_ids(raw: str) -> set[int]:
+    out: set[int] = set()
+    for part in raw.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        try:
+            out.add(int(part))
+        except Exception:
+            pass
+    return out
+
+
+owner_ids = parse_owner_ids(owner_ids_raw)
+
+
+def parse_access_role_map(raw: str) -> dict[int, str]:
+    # "owners:111,222;manager:333" -> {111: "owners", 222: "owners", 333: "manager"}
+    out: dict[int, str] = {}
+    for group in raw.split(";"):
+        level, _, ids = group.partition(":")
+        level = level.strip().lower()
+        if level not in valid_roles:
+            continue
+        for role_id in parse_owner_ids(ids):
+            out[role_id] = level
+    return out
+
+
+# optional: resolve access from discord roles in this guild instead of whitelist_roles
+access_role_levels = parse_access_role_map(os.getenv("access_role_map", ""))
+access_role_guild_id = env_int("access_role_guild_id", env_int("guild_id", 0))
+
+
+def is_int(s: str) -> bool:
+    try:
+        int(s)
+        return True
+    except Exception:
+        return False
+
+
+def format_credits(n: int) -> str:
+    return f"{n:,}"
+
+
+def make_embed(title: str, lines: list[str]) -> discord.Embed:
+    return discord.Embed(title=title, description="\n".join(lines), color=embed_color)
+
+
+def is_digits(s: str) -> bool:
+    return bool(s) and s.isdigit()
+
+def pretty_level(level: str) -> str:
+    if level == "owners":
+        return "Owner"
+    if level == "tag_manager":
+        return "Tag Manager"
+    if level == "manager":
+        return "Manager"
+    if level == "staff":
+        return "Staff"
+    return "None"
+
+
+# -------------------------
+# tracing
+# -------------------------
+
+class span:
+    __slots__ = ("name", "attrs", "start", "end", "children")
+
+    def __init__(self, name: str, attrs: dict):
+        self.name = name
+        self.attrs = attrs
+        self.start = time.perf_counter()
+        self.end: Optional[float] = None
+        self.children: list["span"] = []
+
+    def ms(self) -> float:
+        end = self.end if self.end is not None else time.perf_counter()
+        return (end - self.start) * 1000
+
+    def to_dict(self, t0: float) -> dict:
+        out: dict = {"name": self.name, "at_ms": round((self.start - t0) * 1000, 2), "ms": round(self.ms(), 2)}
+        if self.attrs:
+            out["attrs"] = self.attrs
+        if self.children:
+            out["children"] = [c.to_dict(t0) for c in self.children]
+        return out
+
+
+# innermost open span of the current interaction (None = not traced)
+current_span: contextvars.ContextVar[Optional[span]] = contextvars.ContextVar("current_span", default=None)
+
+
+@contextmanager
+def trace_span(name: str, **attrs):
+    parent = current_span.get()
+    if parent is None:
+        yield None
+        return
+
+    s = span(name, attrs)
+    parent.children.append(s)
+    token = current_span.set(s)
+    try:
+        yield s
+    finally:
+        s.end = time.perf_counter()
+        current_span.reset(token)
+
+
+trace_log = logging.getLogger("slow_interactions")
+trace_log.propagate = False
+
+
+def write_slow_trace(interaction: discord.Interaction, root: span) -> None:
+    if not trace_log.handlers:
+        handler = logging.handlers.RotatingFileHandler(
+            trace_log_path, maxBytes=trace_log_max_bytes, backupCount=trace_log_backups, encoding="utf-8"
+        )
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        trace_log.addHandler(handler)
+        trace_log.setLevel(logging.INFO)
+
+    record = {
+        "ts": datetime.now(timezone.utc).isoformat(),
+        "interaction_id": str(interaction.id),
+        "user_id": str(interaction.user.id),
+        "ms": round(root.ms(), 2),
+        "trace": root.to_dict(root.start),
+    }
+    try:
+        trace_log.info(json.dumps(record, default=str))
+    except Exception:
+        pass
+
+
+def sql_label(query: str) -> str:
+    return " ".join(str(query).split())[:80]
+
+
+class traced_connection(asyncpg.Connection):
+    # puts every query on the current interaction's trace. queries from hot_statements run on
+    # the statements prepared when the connection was opened (see prepare_hot_statements)
+    def hot(self, query, kwargs) -> Optional["asyncpg.prepared_stmt.PreparedStatement"]:
+        if kwargs:
+            return None
+        return getattr(self, "_hot", {}).get(query)
+
+    def drop_hot(self, query) -> None:
+        getattr(self, "_hot", {}).pop(query, None)
+
+    async def execute(self, query, *args, **kwargs):
+        with trace_span("db.execute", sql=sql_label(query)):
+            stmt = self.hot(query, kwargs)
+            if stmt is not None and args:
+                try:
+                    await stmt.fetch(*args)
+                    return stmt.get_statusmsg()
+                except asyncpg.InvalidCachedStatementError:
+                    self.drop_hot(query)
+            return await super().execute(query, *args, **kwargs)
+
+    async def executemany(self, command, args, **kwargs):
+        with trace_span("db.executemany", sql=sql_label(command)):
+            return await super().executemany(command, args, **kwargs)
+
+    async def fetch(self, query, *args, **kwargs):
+        with trace_span("db.fetch", sql=sql_label(query)):
+            stmt = self.hot(query, kwargs)
+            if stmt is not None:
+                try:
+                    return await stmt.fetch(*args)
+                except asyncpg.InvalidCachedStatementError:
+                    self.drop_hot(query)
+            return await super().fetch(query, *args, **kwargs)
+
+    async def fetchrow(self, query, *args, **kwargs):
+        with trace_span("db.fetchrow", sql=sql_label(query)):
+            stmt = self.hot(query, kwargs)
+            if stmt is not None:
+                try:
+                    return await stmt.fetchrow(*args)
+                except asyncpg.InvalidCachedStatementError:
+                    self.drop_hot(query)
+            return await super().fetchrow(query, *args, **kwargs)
+
+    async def fetchval(self, query, *args, **kwargs):
+        with trace_span("db.fetchval", sql=sql_label(query)):
+            stmt = self.hot(query, kwargs)
+            if stmt is not None:
+                try:
+                    return await stmt.fetchval(*args)
+                except asyncpg.InvalidCachedStatementError:
+                    self.drop_hot(query)
+            return await super().fetchval(query, *args, **kwargs)
+
+
+def install_discord_tracing() -> None:
+    # interaction responses, defers and followups all go through the webhook adapter
+    from discord.webhook.async_ import AsyncWebhookAdapter
+
+    if getattr(AsyncWebhookAdapter.request, "_traced", False):
+        return
+    original = AsyncWebhookAdapter.request
+
+    async def request(self, route, *args, **kwargs):
+        with trace_span("discord", method=route.method, path=route.path):
+            return await original(self, route, *args, **kwargs)
+
+    request._traced = True
+    AsyncWebhookAdapter.request = request
+
+
+class roblox_unavailable(RuntimeError):
+    pass
+
+
+class circuit_breaker:
+    # closed until `threshold` failures in a row, then open (reject instantly) for `cooldown`
+    # seconds, then half open: one probe goes through and its result closes or reopens it
+    def __init__(self, name: str, threshold: int, cooldown: float):
+        self.name = name
+        self.threshold = max(threshold, 1)
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._probing = False
+
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if self._probing or time.monotonic() - self.opened_at >= self.cooldown:
+            return "half_open"
+        return "open"
+
+    def check(self) -> None:
+        # raise if a request would be rejected right now, without taking the probe
+        if self.opened_at is None:
+            return
+        left = self.opened_at + self.cooldown - time.monotonic()
+        if left > 0 or self._probing:
+            raise roblox_unavailable(
+                f"{self.name} is not responding right now, try again in {max(int(left), 1)}s."
+            )
+
+    def before(self) -> None:
+        self.check()
+        if self.opened_at is not None:
+            self._probing = True
+
+    def success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+        self._probing = False
+
+    def failure(self) -> None:
+        self.failures += 1
+        if self._probing or self.failures >= self.threshold:
+            self.opened_at = time.monotonic()
+        self._probing = False
+
+    def abandon(self) -> None:
+        # request was cancelled before it said anything about the upstream
+        self._probing = False
+
+
+class roblox_deadline_exceeded(roblox_unavailable):
+    pass
+
+
+# monotonic deadline for the current interaction's roblox calls (None = no budget)
+rbx_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar("rbx_deadline", default=None)
+
+
+# scheduling class of the current task's roblox calls
+rbx_interactive = 0
+rbx_autocomplete = 1
+rbx_bulk = 2
+rbx_priority: contextvars.ContextVar[int] = contextvars.ContextVar("rbx_priority", default=rbx_interactive)
+
+
+def start_bulk_job() -> None:
+    # group-wide jobs crawl the whole group: no overall budget, and their roblox calls go last,
+    # so they yield to interactive commands
+    rbx_deadline.set(None)
+    rbx_priority.set(rbx_bulk)
+
+
+class rbx_scheduler:
+    # hands out roblox request slots by priority. a freed slot goes to the most urgent waiter,
+    # so a running bulk job stops getting slots the moment a command is waiting; bulk never
+    # holds more than bulk_max slots, which keeps the rest free for interactive calls
+    def __init__(self, max_in_flight: int, bulk_max: int):
+        self.max_in_flight = max(max_in_flight, 1)
+        self.bulk_max = max(min(bulk_max, self.max_in_flight), 1)
+        self.in_flight = 0
+        self.bulk_in_flight = 0
+        self._waiters: list[tuple[int, int, asyncio.Future]] = []
+        self._seq = 0
+
+    def _can_run(self, priority: int) -> bool:
+        if self.in_flight >= self.max_in_flight:
+            return False
+        return priority != rbx_bulk or self.bulk_in_flight < self.bulk_max
+
+    def _take(self, priority: int) -> None:
+        self.in_flight += 1
+        if priority == rbx_bulk:
+            self.bulk_in_flight += 1
+
+    async def acquire(self, priority: int) -> None:
+        fut = asyncio.get_running_loop().create_future()
+        self._seq += 1
+        heapq.heappush(self._waiters, (priority, self._seq, fut))
+        self._wake()
+        if fut.done():
+            return
+        try:
+            await fut
+        except asyncio.CancelledError:
+            if fut.done() and not fut.cancelled():
+                # the slot was handed over just as we gave up
+                self.release(priority)
+            raise
+
+    def release(self, priority: int) -> None:
+        self.in_flight -= 1
+        if priority == rbx_bulk:
+            self.bulk_in_flight -= 1
+        self._wake()
+
+    def _wake(self) -> None:
+        skipped: list[tuple[int, int, asyncio.Future]] = []
+        while self._waiters and self.in_flight < self.max_in_flight:
+            item = heapq.heappop(self._waiters)
+            priority, _, fut = item
+            if fut.done():
+                continue
+            if not self._can_run(priority):
+                # bulk at its cap; everything behind it is bulk too
+                skipped.append(item)
+                break
+            self._take(priority)
+            fut.set_result(None)
+        for item in skipped:
+            heapq.heappush(self._waiters, item)
+
+    def waiting(self) -> int:
+        return sum(1 for _, _, f in self._waiters if not f.done())
+
+
+rbx_sched = rbx_scheduler(roblox_max_in_flight, roblox_bulk_max_in_flight)
+
+
+def rbx_timeout(default: float) -> float:
+    deadline = rbx_deadline.get()
+    if deadline is None:
+        return default
+    left = deadline - time.monotonic()
+    if left <= 0:
+        raise roblox_deadline_exceeded("roblox took too long to answer, try again.")
+    return min(default, left)
+
+
+class latency_window:
+    # recent latencies of one idempotent read, used to decide when to hedge it
+    def __init__(self, size: int = 200):
+        self.samples: deque[float] = deque(maxlen=size)
+        self._p95: Optional[float] = None
+        self.sent = 0
+        self.hedged = 0
+
+    def add(self, seconds: float) -> None:
+        self.samples.append(seconds)
+        self._p95 = None
+
+    def p95(self) -> Optional[float]:
+        if len(self.samples) < roblox_hedge_min_samples:
+            return None
+        if self._p95 is None:
+            ordered = sorted(self.samples)
+            self._p95 = ordered[min(int(len(ordered) * 0.95), len(ordered) - 1)]
+        return self._p95
+
+    def hedge_delay(self) -> Optional[float]:
+        # None = don't hedge this one
+        self.sent += 1
+        if self.sent >= 1000:
+            self.sent //= 2
+            self.hedged //= 2
+        if self.hedged >= self.sent * roblox_hedge_max_ratio:
+            return None
+        return self.p95()
+
+
+rbx_latency: dict[str, latency_window] = {}
+
+
+async def rbx_hedged(
+    client: httpx.AsyncClient, method: str, url: str, budget: float, window: latency_window, kwargs: dict
+) -> httpx.Response:
+    # sends the request, and a duplicate if the first is slower than the recent p95.
+    # whichever answers first wins, the other is cancelled
+    delay = window.hedge_delay()
+    if delay is None or delay >= budget:
+        return await client.request(method, url, timeout=budget, **kwargs)
+
+    first = asyncio.ensure_future(client.request(method, url, timeout=budget, **kwargs))
+    pending: set[asyncio.Future] = {first}
+    try:
+        done, pending = await asyncio.wait(pending, timeout=delay)
+        if not done:
+            window.hedged += 1
+            second = asyncio.ensure_future(client.request(method, url, timeout=budget - delay, **kwargs))
+            pending.add(second)
+
+        error: Optional[BaseException] = None
+        while True:
+            for t in done:
+                if t.exception() is None:
+                    return t.result()
+                error = error or t.exception()
+            if not pending:
+                assert error is not None
+                raise error
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for t in pending:
+            t.cancel()
+
+
+rbx_breakers: dict[str, circuit_breaker] = {
+    "open_cloud": circuit_breaker("roblox open cloud", roblox_breaker_threshold, roblox_breaker_cooldown_s),
+    "users": circuit_breaker("roblox users api", roblox_breaker_threshold, roblox_breaker_cooldown_s),
+    "thumbnails": circuit_breaker("roblox thumbnails", roblox_breaker_threshold, roblox_breaker_cooldown_s),
+}
+
+
+class cached_response:
+    __slots__ = ("status", "headers", "body", "etag", "last_modified", "fresh_until")
+
+    def __init__(self, status, headers, body, etag, last_modified, fresh_until):
+        self.status = status
+        self.headers = headers
+        self.body = body
+        self.etag = etag
+        self.last_modified = last_modified
+        self.fresh_until = fresh_until
+
+    def fresh(self) -> bool:
+        return time.time() < self.fresh_until
+
+    def to_response(self, method: str, url: str) -> httpx.Response:
+        return httpx.Response(
+            self.status,
+            headers=json.loads(self.headers),
+            content=self.body,
+            request=httpx.Request(method, url),
+        )
+
+
+class http_cache:
+    # sqlite file of successful roblox responses. sqlite calls are blocking, so they run in a
+    # thread behind a lock; the connection is shared between those threads
+    def __init__(self, path: str):
+        self.path = path
+        self.db: Optional[sqlite3.Connection] = None
+        self.lock = threading.Lock()
+        # key -> last read, written out in batches; used_at only decides what open() prunes
+        self._used: dict[str, float] = {}
+
+    def open(self) -> None:
+        db = sqlite3.connect(self.path, check_same_thread=False)
+        db.execute("pragma journal_mode=wal;")
+        db.execute("pragma synchronous=normal;")
+        db.execute(
+            """
+            create table if not exists responses (
+                key text primary key,
+                status integer not null,
+                headers text not null,
+                body blob not null,
+                etag text,
+                last_modified text,
+                fresh_until real not null,
+                used_at real not null
+            );
+            """
+        )
+        db.execute("delete from responses where used_at < ?;", (time.time() - roblox_cache_keep_s,))
+        db.commit()
+        self.db = db
+
+    def _flush_used(self) -> None:
+        # under self.lock, with the db open
+        if self._used:
+            self.db.executemany(
+                "update responses set used_at = ? where key = ?;", [(t, k) for k, t in self._used.items()]
+            )
+            self._used.clear()
+
+    def close(self) -> None:
+        with self.lock:
+            if self.db is not None:
+                self._flush_used()
+                self.db.commit()
+                self.db.close()
+                self.db = None
+
+    @staticmethod
+    def key(method: str, url: str, kwargs: dict) -> str:
+        # headers are left out on purpose, they only carry the api key
+        raw = json.dumps(
+            [method, url, kwargs.get("params"), kwargs.get("json")], sort_keys=True, default=str
+        )
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    def _get(self, key: str) -> Optional[cached_response]:
+        with self.lock:
+            if self.db is None:
+                return None
+            row = self.db.execute(
+                "select status, headers, body, etag, last_modified, fresh_until from responses where key = ?;",
+                (key,),
+            ).fetchone()
+            if row is None:
+                return None
+            self._used[key] = time.time()
+            if len(self._used) >= 256:
+                self._flush_used()
+                self.db.commit()
+        return cached_response(*row)
+
+    def _put(self, key: str, r: httpx.Response, ttl: float) -> cached_response:
+        headers = json.dumps({"content-type": r.headers.get("content-type", "application/json")})
+        entry = cached_response(
+            r.status_code,
+            headers,
+            r.content,
+            r.headers.get("etag"),
+            r.headers.get("last-modified"),
+            time.time() + ttl,
+        )
+        with self.lock:
+            if self.db is not None:
+                self.db.execute(
+                    """
+                    insert or replace into responses
+                        (key, status, headers, body, etag, last_modified, fresh_until, used_at)
+                    values (?, ?, ?, ?, ?, ?, ?, ?);
+                    """,
+                    (key, entry.status, entry.headers, entry.body, entry.etag, entry.last_modified,
+                     entry.fresh_until, time.time()),
+                )
+                self._used.pop(key, None)
+                self._flush_used()
+                self.db.commit()
+        return entry
+
+    def _refresh(self, key: str, ttl: float) -> None:
+        with self.lock:
+            if self.db is not None:
+                now = time.time()
+                self.db.execute(
+                    "update responses set fresh_until = ?, used_at = ? where key = ?;", (now + ttl, now, key)
+                )
+                self._used.pop(key, None)
+                self._flush_used()
+                self.db.commit()
+
+    async def get(self, key: str) -> Optional[cached_response]:
+        if self.db is None:
+            return None
+        try:
+            return await asyncio.to_thread(self._get, key)
+        except Exception as e:
+            print("roblox http cache read failed:", e)
+            return None
+
+    async def put(self, key: str, r: httpx.Response, ttl: float) -> None:
+        if self.db is None:
+            return
+        try:
+            await asyncio.to_thread(self._put, key, r, ttl)
+        except Exception as e:
+            print("roblox http cache write failed:", e)
+
+    async def refresh(self, key: str, ttl: float) -> None:
+        if self.db is None:
+            return
+        try:
+            await asyncio.to_thread(self._refresh, key, ttl)
+        except Exception as e:
+            print("roblox http cache write failed:", e)
+
+
+rbx_http_cache = http_cache(roblox_http_cache_path) if roblox_http_cache_path else None
+
+
+async def rbx_send(
+    client: httpx.AsyncClient,
+    upstream: str,
+    method: str,
+    url: str,
+    *,
+    hedge: Optional[str] = None,
+    timeout: Optional[float] = None,
+    cache_ttl: Optional[float] = None,
+    cache_if=None,
+    revalidate: bool = False,
+    **kwargs,
+) -> httpx.Response:
+    # cache_ttl=<seconds> marks a read whose 200s may be kept in the on-disk cache: fresh entries
+    # are served without a request, stale ones are revalidated and a 304 just extends them.
+    # cache_if(response) can veto storing a 200 (e.g. an empty lookup result); revalidate=True
+    # treats a fresh entry as stale, so roblox is always asked (conditionally)
+    if cache_ttl is None or rbx_http_cache is None or rbx_http_cache.db is None:
+        return await rbx_send_uncached(client, upstream, method, url, hedge=hedge, timeout=timeout, **kwargs)
+
+    key = http_cache.key(method, url, kwargs)
+    entry = await rbx_http_cache.get(key)
+    if entry is not None and entry.fresh() and not revalidate:
+        return entry.to_response(method, url)
+
+    if entry is not None and (entry.etag or entry.last_modified):
+        headers = dict(kwargs.pop("headers", None) or {})
+        if entry.etag:
+            headers["if-none-match"] = entry.etag
+        if entry.last_modified:
+            headers["if-modified-since"] = entry.last_modified
+        kwargs["headers"] = headers
+
+    r = await rbx_send_uncached(client, upstream, method, url, hedge=hedge, timeout=timeout, **kwargs)
+    if r.status_code == 304 and entry is not None:
+        await rbx_http_cache.refresh(key, cache_ttl)
+        return entry.to_response(method, url)
+    if r.status_code == 200 and (cache_if is None or cache_if(r)):
+        await rbx_http_cache.put(key, r, cache_ttl)
+    return r
+
+
+async def rbx_send_uncached(
+    client: httpx.AsyncClient,
+    upstream: str,
+    method: str,
+    url: str,
+    *,
+    hedge: Optional[str] = None,
+    timeout: Optional[float] = None,
+    **kwargs,
+) -> httpx.Response:
+    # every roblox request goes through here: it waits for a slot from the scheduler, the
+    # upstream's breaker sees it, its timeout is cut to the interaction's deadline, and
+    # idempotent reads (hedge=<name>) may be hedged
+    priority = rbx_priority.get()
+    full_timeout = timeout or roblox_timeout_s
+    # fail fast on an open breaker instead of queueing behind slow requests first
+    rbx_breakers[upstream].check()
+    try:
+        with trace_span("roblox.queue", priority=priority):
+            if priority == rbx_bulk and rbx_deadline.get() is None:
+                # a bulk job without a budget waits behind interactive calls as long as it takes
+                await rbx_sched.acquire(priority)
+            else:
+                # before acquire() is created: a spent deadline raises here
+                wait_s = rbx_timeout(full_timeout)
+                await asyncio.wait_for(rbx_sched.acquire(priority), wait_s)
+    except asyncio.TimeoutError:
+        raise roblox_deadline_exceeded("roblox took too long to answer, try again.")
+    try:
+        return await rbx_send_slotted(client, upstream, method, url, priority, full_timeout, hedge, kwargs)
+    finally:
+        rbx_sched.release(priority)
+
+
+async def rbx_send_slotted(
+    client: httpx.AsyncClient,
+    upstream: str,
+    method: str,
+    url: str,
+    priority: int,
+    full_timeout: float,
+    hedge: Optional[str],
+    kwargs: dict,
+) -> httpx.Response:
+    budget = rbx_timeout(full_timeout)
+    breaker = rbx_breakers[upstream]
+    breaker.before()
+
+    started = time.monotonic()
+    try:
+        with trace_span("roblox", upstream=upstream, method=method, url=url.split("?")[0]):
+            if hedge:
+                window = rbx_latency.setdefault(hedge, latency_window())
+                r = await rbx_hedged(client, method, url, budget, window, kwargs)
+            else:
+                r = await client.request(method, url, timeout=budget, **kwargs)
+    except httpx.TimeoutException:
+        if budget < full_timeout:
+            # our own budget ran out, that says nothing about the upstream
+            breaker.abandon()
+            raise roblox_deadline_exceeded("roblox took too long to answer, try again.")
+        breaker.failure()
+        raise
+    except httpx.TransportError:
+        breaker.failure()
+        raise
+    except BaseException:
+        breaker.abandon()
+        raise
+
+    if r.status_code >= 500 or r.status_code == 429:
+        breaker.failure()
+    else:
+        breaker.success()
+        if hedge:
+            rbx_latency[hedge].add(time.monotonic() - started)
+    return r
+
+
+# -------------------------
+# roblox payloads
+# -------------------------
+
+def json_loads(raw: bytes):
+    if fast_json is not None:
+        return fast_json.loads(raw)
+    return json.loads(raw)
+
+
+def rbx_json(r: httpx.Response) -> dict:
+    return json_loads(r.content) if r.content else {}
+
+
+def path_tail_int(path: str) -> Optional[int]:
+    tail = path.rpartition("/")[2]
+    return int(tail) if tail.isdigit() else None
+
+
+class rbx_role:
+    __slots__ = ("role_id", "display_name", "rank", "member_count")
+
+    def __init__(self, role_id: int, display_name: str, rank: Optional[int], member_count: Optional[int]):
+        self.role_id = role_id
+        self.display_name = display_name
+        self.rank = rank
+        self.member_count = member_count
+
+
+class rbx_membership:
+    __slots__ = ("membership_id", "user_id", "role_id", "update_time", "path")
+
+    def __init__(
+        self,
+        membership_id: Optional[str],
+        user_id: Optional[int],
+        role_id: Optional[int],
+        update_time: str,
+        path: str,
+    ):
+        self.membership_id = membership_id
+        self.user_id = user_id
+        self.role_id = role_id
+        self.update_time = update_time
+        self.path = path
+
+
+class rbx_user:
+    __slots__ = ("user_id", "name", "display_name")
+
+    def __init__(self, user_id: int, name: str, display_name: str):
+        self.user_id = user_id
+        self.name = name
+        self.display_name = display_name
+
+
+def role_from_api(r: dict) -> Optional[rbx_role]:
+    rid: Optional[int] = None
+    raw_id = r.get("id")
+    if raw_id is not None and str(raw_id).isdigit():
+        rid = int(raw_id)
+    if rid is None:
+        rid = path_tail_int(str(r.get("path") or r.get("name") or ""))
+    if rid is None:
+        return None
+
+    try:
+        rank: Optional[int] = int(r.get("rank"))
+    except Exception:
+        rank = None
+    try:
+        count: Optional[int] = int(r.get("memberCount"))
+    except Exception:
+        count = None
+
+    return rbx_role(rid, str(r.get("displayName") or "").strip(), rank, count)
+
+
+def membership_from_api(m: dict) -> rbx_membership:
+    # ids are parsed here, once, instead of by every command that looks at the member
+    path = m.get("path") or m.get("name") or ""
+    tail = path.rpartition("/")[2].strip()
+    return rbx_membership(
+        tail or None,
+        path_tail_int(m.get("user") or ""),
+        path_tail_int(m.get("role") or ""),
+        m.get("updateTime") or "",
+        path,
+    )
+
+
+def memberships_from_page(data: dict) -> list[rbx_membership]:
+    items = data.get("groupMemberships") or data.get("memberships") or []
+    return [membership_from_api(m) for m in items]
+
+
+async def roblox_username_to_user_id(client: httpx.AsyncClient, username: str) -> Optional[int]:
+    username = (username or "").strip()
+    if not username:
+        return None
+
+    payload = {"usernames": [username], "excludeBannedUsers": False}
+    try:
+        r = await rbx_send(
+            client,
+            "users",
+            "POST",
+            f"{ROBLOX_USERS}/usernames/users",
+            hedge="users.lookup",
+            cache_ttl=roblox_cache_username_s,
+            # an unknown name may be registered any minute, only hits are cached
+            cache_if=lambda resp: bool(rbx_json(resp).get("data")),
+            json=payload,
+        )
+    except roblox_unavailable:
+        raise
+    except Exception:
+        return None
+
+    if r.status_code >= 400:
+        return None
+
+    try:
+        users = [
+            rbx_user(int(u["id"]), str(u.get("name") or ""), str(u.get("displayName") or ""))
+            for u in rbx_json(r).get("data") or []
+        ]
+    except Exception:
+        return None
+    if not users:
+        return None
+    rbx_names.put(users[0].user_id, users[0].name)
+    return users[0].user_id
+
+
+class name_cache:
+    # lru of roblox user id -> username
+    def __init__(self, max_size: int, ttl_s: float):
+        self.max_size = max_size
+        self.ttl_s = ttl_s
+        self._data: OrderedDict[int, tuple[str, float]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, user_id: int) -> Optional[str]:
+        hit = self._data.get(user_id)
+        if hit is None:
+            return None
+        if time.monotonic() - hit[1] > self.ttl_s:
+            del self._data[user_id]
+            return None
+        self._data.move_to_end(user_id)
+        return hit[0]
+
+    def put(self, user_id: int, name: str) -> None:
+        if self.max_size <= 0 or not name:
+            return
+        self._data[user_id] = (name, time.monotonic())
+        self._data.move_to_end(user_id)
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+
+
+rbx_names = name_cache(roblox_name_cache_size, roblox_name_ttl_s)
+
+
+async def roblox_usernames(client: httpx.AsyncClient, user_ids) -> dict[int, str]:
+    # user id -> username. misses go to the multi-user lookup, 100 ids per request, chunks at
+    # once. names are only for display, so ids that fail to resolve are just left out
+    out: dict[int, str] = {}
+    missing: list[int] = []
+    for uid in dict.fromkeys(int(u) for u in user_ids if u):
+        name = rbx_names.get(uid)
+        if name is not None:
+            out[uid] = name
+        else:
+            missing.append(uid)
+
+    async def chunk(ids: list[int]) -> None:
+        try:
+            r = await rbx_send(
+                client,
+                "users",
+                "POST",
+                f"{ROBLOX_USERS}/users",
+                hedge="users.batch",
+                json={"userIds": ids, "excludeBannedUsers": False},
+            )
+            if r.status_code >= 400:
+                return
+            for u in rbx_json(r).get("data") or []:
+                user = rbx_user(int(u["id"]), str(u.get("name") or ""), str(u.get("displayName") or ""))
+                rbx_names.put(user.user_id, user.name)
+                if user.name:
+                    out[user.user_id] = user.name
+        except Exception:
+            return
+
+    if missing:
+        await asyncio.gather(*(chunk(missing[i:i + 100]) for i in range(0, len(missing), 100)))
+    return out
+
+
+def rbx_user_label(user_id: int, names: dict[int, str]) -> str:
+    name = names.get(int(user_id))
+    return f"`{name}` (`{user_id}`)" if name else f"`{user_id}`"
+
+
+def roblox_headers() -> dict:
+    return {"x-api-key": roblox_api_key, "content-type": "application/json"}
+
+
+async def roblox_list_roles(client: httpx.AsyncClient, revalidate: bool = False) -> list[rbx_role]:
+    r = await rbx_send(
+        client,
+        "open_cloud",
+        "GET",
+        f"{ROBLOX_BASE}/groups/{ROBLOX_GROUP_ID}/roles",
+        hedge="roles.list",
+        cache_ttl=roblox_cache_roles_s,
+        revalidate=revalidate,
+        headers=roblox_headers(),
+    )
+    r.raise_for_status()
+    data = rbx_json(r)
+    out: list[rbx_role] = []
+    for raw in data.get("groupRoles") or data.get("roles") or []:
+        role = role_from_api(raw)
+        if role is not None:
+            out.append(role)
+    return out
+
+
+async def roblox_get_membership(client: httpx.AsyncClient, user_id: int) -> Optional[rbx_membership]:
+    params = {"maxPageSize": "10", "filter": f"user == 'users/{int(user_id)}'"}
+    r = await rbx_send(
+        client,
+        "open_cloud",
+        "GET",
+        f"{ROBLOX_BASE}/groups/{ROBLOX_GROUP_ID}/memberships",
+        hedge="membership.get",
+        headers=roblox_headers(),
+        params=params,
+    )
+    r.raise_for_status()
+    memberships = memberships_from_page(rbx_json(r))
+    if not memberships:
+        return None
+    return memberships[0]
+
+async def roblox_avatar_url(client: httpx.AsyncClient, user_id: int) -> str:
+    try:
+        r = await rbx_send(
+            client,
+            "thumbnails",
+            "GET",
+            f"{ROBLOX_THUMBNAILS}/users/avatar-headshot",
+            hedge="thumbnails.avatar",
+            cache_ttl=roblox_cache_avatar_s,
+            params={
+                "userIds": str(user_id),
+                "size": "150x150",
+                "format": "Png",
+                "isCircular": "true",
+            },
+            timeout=10,
+        )
+        data = rbx_json(r)
+        return data["data"][0]["imageUrl"]
+    except Exception:
+        return ""
+
+async def roblox_members_in_role(client: httpx.AsyncClient, role_id: int) -> list[rbx_membership]:
+    return [m async for m in roblox_iter_memberships(client) if m.role_id == role_id]
+
+
+async def roblox_set_role_by_membership_id(client: httpx.AsyncClient, membership_id: str, role_id: int) -> None:
+    body = {"role": f"groups/{ROBLOX_GROUP_ID}/roles/{int(role_id)}"}
+    r = await rbx_send(
+        client,
+        "open_cloud",
+        "PATCH",
+        f"{ROBLOX_BASE}/groups/{ROBLOX_GROUP_ID}/memberships/{membership_id}",
+        headers=roblox_headers(),
+        json=body,
+    )
+
+    if r.status_code >= 400:
+        try:
+            data = rbx_json(r)
+        except Exception:
+            data = None
+        if data:
+            raise RuntimeError(f"roblox error {r.status_code}: {data}")
+        txt = (r.text or "")[:300]
+        raise RuntimeError(f"roblox error {r.status_code}: {txt}")
+
+
+class rank_outcome:
+    # role_id: what the membership was left at (another caller's, if a newer change won).
+    # patched: whether a PATCH was sent for it, False when it already had that role
+    __slots__ = ("role_id", "patched")
+
+    def __init__(self, role_id: int, patched: bool):
+        self.role_id = role_id
+        self.patched = patched
+
+
+class rank_pending:
+    __slots__ = ("want", "seen", "priority", "futs", "task")
+
+    def __init__(self):
+        self.want: Optional[int] = None
+        self.seen: Optional[int] = None
+        # most urgent roblox priority among the callers waiting on the next PATCH
+        self.priority = rbx_bulk
+        self.futs: list[asyncio.Future] = []
+        self.task: Optional[asyncio.Task] = None
+
+
+class rank_changes:
+    # every role change goes through here, one worker per membership. changes that queue up
+    # behind a running PATCH collapse into one PATCH to the newest role (last writer wins),
+    # and a change to the role the membership already has sends nothing
+    def __init__(self, known_ttl_s: float, max_known: int = 10_000):
+        self.known_ttl_s = known_ttl_s
+        self.max_known = max_known
+        self._pending: dict[str, rank_pending] = {}
+        self._known: OrderedDict[str, tuple[int, float]] = OrderedDict()
+        # roblox user id -> membership id, so a repeat of our own change is caught before any lookup
+        self._members: OrderedDict[int, str] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._known)
+
+    def known_role(self, membership_id: str) -> Optional[int]:
+        hit = self._known.get(membership_id)
+        if hit is None or time.monotonic() - hit[1] > self.known_ttl_s:
+            return None
+        return hit[0]
+
+    def known_user_role(self, user_id: int) -> Optional[int]:
+        # the role we last set for this user, unless a change to them is still in flight
+        membership_id = self._members.get(int(user_id))
+        if membership_id is None or membership_id in self._pending:
+            return None
+        return self.known_role(membership_id)
+
+    def _remember(self, membership_id: str, role_id: int) -> None:
+        self._known[membership_id] = (role_id, time.monotonic())
+        self._known.move_to_end(membership_id)
+        while len(self._known) > self.max_known:
+            self._known.popitem(last=False)
+
+    async def set_role(
+        self,
+        client: httpx.AsyncClient,
+        membership_id: str,
+        role_id: int,
+        current_role_id: Optional[int] = None,
+        user_id: Optional[int] = None,
+    ) -> rank_outcome:
+        # current_role_id: the role the caller just read, if it did
+        if user_id is not None:
+            self._members[int(user_id)] = membership_id
+            self._members.move_to_end(int(user_id))
+            while len(self._members) > self.max_known:
+                self._members.popitem(last=False)
+        st = self._pending.get(membership_id)
+        if st is None:
+            st = self._pending[membership_id] = rank_pending()
+        st.want = int(role_id)
+        if current_role_id is not None:
+            st.seen = int(current_role_id)
+        st.priority = min(st.priority, rbx_priority.get())
+        fut = asyncio.get_running_loop().create_future()
+        st.futs.append(fut)
+        if st.task is None:
+            st.task = asyncio.create_task(self._run(client, membership_id, st))
+        return await fut
+
+    async def _run(self, client: httpx.AsyncClient, membership_id: str, st: rank_pending) -> None:
+        # the task copied the first caller's context; the PATCH is shared by every waiter, so it
+        # has no caller's deadline and goes at the most urgent waiter's priority
+        rbx_deadline.set(None)
+        try:
+            while st.futs:
+                want, futs = st.want, st.futs
+                st.futs = []
+                rbx_priority.set(st.priority)
+                st.priority = rbx_bulk
+
+                # a role the caller just read beats what we last set: it may have been changed
+                # since by someone else (the site, in game, another worker)
+                have = st.seen
+                if have is None:
+                    have = self.known_role(membership_id)
+                if have == want:
+                    outcome = rank_outcome(want, False)
+                else:
+                    try:
+                        await roblox_set_role_by_membership_id(client, membership_id, want)
+                    except Exception as e:
+                        for f in futs:
+                            if not f.done():
+                                f.set_exception(e)
+                        continue
+                    self._remember(membership_id, want)
+                    st.seen = want
+                    outcome = rank_outcome(want, True)
+
+                for f in futs:
+                    if not f.done():
+                        f.set_result(outcome)
+        finally:
+            self._pending.pop(membership_id, None)
+
+
+rbx_rank_changes = rank_changes(roblox_rank_known_ttl_s)
+
+
+# -------------------------
+# throttling
+# -------------------------
+
+command_costs: dict[str, float] = {
+    "creditsleaderboard": 2,
+    "creditstop": 2,
+    "roles": 2,
+    "rolecheck": 2,
+    "role": 3,
+    "unrole": 3,
+    "rolecensus": 4,
+    "inrole": 8,
+    "export-roster": 8,
+    "reconcile": 10,
+    "group-wipe": 10,
+}
+
+# shared by everyone: (burst, refill per second) for the commands that hit roblox or the db hardest
+command_limits: dict[str, tuple[float, float]] = {
+    "creditsleaderboard": (20, 1.0),
+    "creditstop": (20, 1.0),
+    "rolecensus": (4, 1 / 30),
+    "inrole": (3, 1 / 60),
+    "export-roster": (2, 1 / 120),
+    "reconcile": (2, 1 / 300),
+    "group-wipe": (1, 1 / 600),
+}
+
+
+class token_bucket:
+    __slots__ = ("capacity", "rate", "tokens", "updated")
+
+    def __init__(self, capacity: float, rate: float):
+        self.capacity = capacity
+        self.rate = rate
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_for(self, cost: float) -> float:
+        # seconds until `cost` tokens are available (0 = now)
+        # a cost above capacity is allowed from a full bucket and leaves it in debt
+        self.refill()
+        need = min(cost, self.capacity)
+        if self.tokens >= need:
+            return 0.0
+        if self.rate <= 0:
+            return float("inf")
+        return (need - self.tokens) / self.rate
+
+
+class command_throttle:
+    def __init__(self, max_users: int = 10_000):
+        self.max_users = max_users
+        self.users: OrderedDict[int, token_bucket] = OrderedDict()
+        self.commands: dict[str, token_bucket] = {}
+
+    def check(self, user_id: int, command: str) -> float:
+        # charges the user's own bucket. returns 0 if allowed, otherwise seconds to wait
+        cost = command_costs.get(command, 1)
+        user = self.users.get(user_id)
+        if user is None:
+            user = self.users[user_id] = token_bucket(throttle_user_burst, throttle_user_rate)
+            self._evict()
+        else:
+            self.users.move_to_end(user_id)
+
+        wait = user.wait_for(cost)
+        if wait > 0:
+            return wait
+        user.tokens -= cost
+        return 0.0
+
+    def charge_command(self, command: str) -> float:
+        # charges the bucket everyone shares for this command, if it has one.
+        # only called once the caller is allowed to run it, so nobody else can drain it
+        if command not in command_limits:
+            return 0.0
+        shared = self.commands.get(command)
+        if shared is None:
+            shared = self.commands[command] = token_bucket(*command_limits[command])
+        wait = shared.wait_for(1)
+        if wait > 0:
+            return wait
+        shared.tokens -= 1
+        return 0.0
+
+    def _evict(self) -> None:
+        # least recently seen users go first
+        while len(self.users) > self.max_users:
+            self.users.popitem(last=False)
+
+
+async def ensure_schema_at(dsn: str) -> None:
+    # on a connection of its own, before the pool exists, so the pool's init hook prepares
+    # its statements against the finished schema and the warm connections are kept
+    con = await asyncpg.connect(dsn, **({"statement_cache_size": 0} if db_pgbouncer else {}))
+    try:
+        await ensure_schema(con)
+    finally:
+        await con.close()
+
+
+async def ensure_schema(con: asyncpg.Connection) -> None:
+    await con.execute(
+        """
+        create table if not exists credits (
+            user_id bigint primary key,
+            credits bigint not null default 0
+        );
+        """
+    )
+    await con.execute(
+        """
+        create table if not exists whitelist_roles (
+            user_id bigint not null,
+            role text not null,
+            primary key (user_id, role)
+        );
+        """
+    )
+    await con.execute(
+        """
+        create table if not exists credit_ledger (
+            id bigserial,
+            user_id bigint not null,
+            kind text not null,
+            delta bigint not null,
+            balance bigint not null,
+            created_at timestamptz not null default now(),
+            primary key (created_at, id)
+        ) partition by range (created_at);
+        """
+    )
+    await con.execute(
+        """
+        create table if not exists credit_ledger_default partition of credit_ledger default;
+        create index if not exists credit_ledger_user_idx on credit_ledger (user_id, created_at);
+        """
+    )
+    await con.execute(
+        """
+        create table if not exists credit_daily (
+            day date not null,
+            user_id bigint not null,
+            earned bigint not null default 0,
+            spent bigint not null default 0,
+            primary key (day, user_id)
+        );
+        create index if not exists credit_daily_user_idx on credit_daily (user_id, day);
+        """
+    )
+    await ensure_ledger_partitions(con)
+    await con.execute(
+        """
+        create table if not exists rank_targets (
+            user_id bigint primary key,
+            role_id bigint not null
+        );
+        """
+    )
+
+
+# command groups, each a discord.py extension that /reload can swap in place
+initial_extensions = ("cogs.roblox", "cogs.credits", "cogs.whitelist", "cogs.admin")
+
+
+class credit_tree(app_commands.CommandTree):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.throttle = command_throttle(throttle_max_users)
+
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        # every interaction starts with a fresh roblox time budget
+        if interaction.type is discord.InteractionType.autocomplete:
+            rbx_deadline.set(time.monotonic() + roblox_autocomplete_deadline_s)
+            rbx_priority.set(rbx_autocomplete)
+            return True
+        rbx_deadline.set(time.monotonic() + roblox_deadline_s)
+        rbx_priority.set(rbx_interactive)
+
+        # the user's own bucket is charged before require_access, so spam doesn't even cost a
+        # db lookup; shared per-command limits are charged by the command (charge_shared_limit)
+        command = interaction.command.qualified_name if interaction.command else ""
+        wait = self.throttle.check(int(interaction.user.id), command)
+        if wait > 0:
+            try:
+                await interaction.response.send_message(
+                    f"slow down, try `/{command}` again in {max(int(wait + 0.999), 1)}s.", ephemeral=True
+                )
+            except Exception:
+                pass
+            return False
+        return True
+
+    async def _call(self, interaction: discord.Interaction) -> None:
+        # wraps discord.py's (2.4) per-interaction entry point so the whole run is one trace
+        if trace_slow_ms <= 0 or random.random() >= trace_sample_rate:
+            await super()._call(interaction)
+            return
+
+        data = interaction.data or {}
+        root = span("interaction", {"command": str(data.get("name") or ""), "type": interaction.type.name})
+        token = current_span.set(root)
+        try:
+            await super()._call(interaction)
+        finally:
+            root.end = time.perf_counter()
+            current_span.reset(token)
+            if root.ms() >= trace_slow_ms:
+                write_slow_trace(interaction, root)
+
+
+class credit_bot(commands.Bot):
+    def __init__(self):
+        if low_memory:
+            super().__init__(
+                command_prefix="!",
+                intents=discord.Intents.none(),
+                tree_cls=credit_tree,
+                member_cache_flags=discord.MemberCacheFlags.none(),
+                max_messages=None,
+                chunk_guilds_at_startup=False,
+            )
+        else:
+            super().__init__(command_prefix="!", intents=discord.Intents.default(), tree_cls=credit_tree)
+        self.pool: Optional[asyncpg.Pool] = None
+        self.replica_pool: Optional[asyncpg.Pool] = None
+        self._replica_down_until = 0.0
+        self._replica_opening: Optional[asyncio.Task] = None
+        self.rbx_http: Optional[httpx.AsyncClient] = None
+        self.credit_agg: Optional["credit_aggregator"] = None
+        self._ledger_task: Optional[asyncio.Task] = None
+
+        self._rbx_roles: list[rbx_role] = []
+        self._rbx_roles_by_id: dict[int, rbx_role] = {}
+        self._rbx_lowest_assignable_role_id: Optional[int] = None
+        self.rbx_snapshot: Optional[member_snapshot] = None
+        self._export_lock = asyncio.Lock()
+        self._ingest_runner: Optional[web.AppRunner] = None
+        self._rbx_snapshot_task: Optional[asyncio.Task] = None
+
+    async def setup_hook(self):
+        self.rbx_http = httpx.AsyncClient(timeout=roblox_timeout_s)
+        if rbx_http_cache is not None:
+            try:
+                await asyncio.to_thread(rbx_http_cache.open)
+            except Exception as e:
+                print("roblox http cache unavailable, continuing without it:", e)
+        await store.open()
+        if trace_slow_ms > 0:
+            install_discord_tracing()
+
+        self.rbx_snapshot = member_snapshot.load(roblox_snapshot_path)
+        if self.rbx_snapshot is not None:
+            print(f"loaded group snapshot: {len(self.rbx_snapshot)} members")
+
+        if credits_coalesce_ms > 0:
+            self.credit_agg = credit_aggregator(credits_coalesce_ms, credits_coalesce_max_batch)
+        if not skip_ledger_maintenance:
+            self._ledger_task = asyncio.create_task(ledger_maintenance_loop())
+        if ingest_port > 0:
+            self._ingest_runner = await start_ingest_server()
+
+        for ext in initial_extensions:
+            await self.load_extension(ext)
+
+        if not skip_command_sync:
+            await self.sync_commands()
+
+    def command_guild(self) -> Optional[discord.Object]:
+        if guild_id_raw and is_int(guild_id_raw):
+            return discord.Object(id=int(guild_id_raw))
+        return None
+
+    def refresh_guild_commands(self) -> None:
+        # guild mode runs copies of the global commands, so they are re-copied after a reload
+        guild = self.command_guild()
+        if guild is not None:
+            self.tree.clear_commands(guild=guild)
+            self.tree.copy_global_to(guild=guild)
+
+    async def sync_commands(self) -> None:
+        guild = self.command_guild()
+        self.refresh_guild_commands()
+        if guild is not None:
+            await self.tree.sync(guild=guild)
+            print("synced commands to guild")
+        else:
+            await self.tree.sync()
+            print("synced commands globally")
+
+    async def open_replica_pool(self) -> None:
+        try:
+            self.replica_pool = await asyncpg.create_pool(database_replica_url, **db_pool_kwargs())
+            print("read replica pool ready")
+        except Exception as e:
+            print("read replica unreachable, reads use the primary:", e)
+            self.replica_pool = None
+            self._replica_down_until = asyncio.get_running_loop().time() + replica_retry_s
+
+    def read_pool(self) -> Optional[asyncpg.Pool]:
+        # replica if configured and not in its cooldown, otherwise None (use the primary)
+        if not database_replica_url:
+            return None
+        if asyncio.get_running_loop().time() < self._replica_down_until:
+            return None
+        if self.replica_pool is None:
+            if self._replica_opening is None or self._replica_opening.done():
+                self._replica_opening = asyncio.create_task(self.open_replica_pool())
+            return None
+        return self.replica_pool
+
+    def replica_failed(self, err: Exception) -> None:
+        print("read replica failed, falling back to primary:", err)
+        self._replica_down_until = asyncio.get_running_loop().time() + replica_retry_s
+
+    async def close(self):
+        if self._ingest_runner:
+            await self._ingest_runner.cleanup()
+        if self._ledger_task:
+            self._ledger_task.cancel()
+        if self.credit_agg:
+            await self.credit_agg.close()
+        if self.rbx_http:
+            await self.rbx_http.aclose()
+        if rbx_http_cache is not None:
+            await asyncio.to_thread(rbx_http_cache.close)
+        await store.close()
+        await super().close()
+
+
+bot = credit_bot()
+
+
+# -------------------------
+# db pool
+# -------------------------
+
+class database_busy(RuntimeError):
+    pass
+
+
+sql_get_credits = "select credits from credits where user_id = $1;"
+
+sql_get_user_roles = "select role from whitelist_roles where user_id = $1;"
+
+sql_leaderboard = """
+    select user_id, credits
+    from credits
+    where credits > 0
+    order by credits desc, user_id asc;
+"""
+
+sql_lock_balances = """
+    insert into credits (user_id, credits)
+    select unnest($1::bigint[]), 0
+    on conflict (user_id) do update set credits = credits.credits
+    returning user_id, credits;
+"""
+
+sql_write_balances = """
+    with upd as (
+        update credits as c
+        set credits = v.credits
+        from unnest($1::bigint[], $2::bigint[]) as v(user_id, credits)
+        where c.user_id = v.user_id
+    ),
+    led as (
+        insert into credit_ledger (user_id, kind, delta, balance)
+        select * from unnest($3::bigint[], $4::text[], $5::bigint[], $6::bigint[])
+        returning user_id, kind, delta, created_at
+    )
+    -- /setcredits corrections stay in the ledger but aren't earnings or spending
+    insert into credit_daily (day, user_id, earned, spent)
+    select (created_at at time zone 'utc')::date, user_id,
+           sum(greatest(delta, 0)), sum(greatest(-delta, 0))
+    from led
+    where kind <> 'set'
+    group by 1, 2
+    on conflict (day, user_id) do update
+    set earned = credit_daily.earned + excluded.earned,
+        spent = credit_daily.spent + excluded.spent;
+"""
+
+# prepared on every new pool connection
+hot_statements = (
+    sql_get_credits,
+    sql_get_user_roles,
+    sql_leaderboard,
+    sql_lock_balances,
+    sql_write_balances,
+)
+
+
+async def prepare_hot_statements(con: asyncpg.Connection) -> None:
+    # pool init hook. a statement whose tables don't exist yet (first start, before ensure_schema)
+    # is skipped and runs unprepared until the pool's connections are recycled
+    if db_pgbouncer:
+        return
+    hot = {}
+    for query in hot_statements:
+        try:
+            hot[query] = await con.prepare(query)
+        except asyncpg.PostgresError:
+            continue
+    con._hot = hot
+
+
+def db_pool_kwargs(**overrides) -> dict:
+    kwargs = dict(
+        min_size=max(min(db_pool_min, db_pool_max), 0),
+        max_size=max(db_pool_max, 1),
+        connection_class=traced_connection,
+        init=prepare_hot_statements,
+    )
+    if db_pgbouncer:
+        kwargs["statement_cache_size"] = 0
+    kwargs.update(overrides)
+    return kwargs
+
+
+# errors that mean "the replica is gone", not "the query is wrong"
+replica_errors = (
+    OSError,
+    asyncio.TimeoutError,
+    asyncpg.PostgresConnectionError,
+    asyncpg.InterfaceError,
+    asyncpg.CannotConnectNowError,
+)
+
+
+@asynccontextmanager
+async def db_conn(pool: Optional[asyncpg.Pool] = None, timeout: Optional[float] = None):
+    # pool.acquire() with the wait on the trace. a pool that stays saturated past the timeout
+    # fails fast with database_busy instead of queueing the interaction forever
+    pool = pool or bot.pool
+    assert pool is not None
+    if timeout is None:
+        timeout = db_acquire_timeout if db_acquire_timeout > 0 else None
+    with trace_span("db.acquire"):
+        try:
+            con = await pool.acquire(timeout=timeout)
+        except asyncio.TimeoutError:
+            raise database_busy("the bot is busy right now, try again in a moment.")
+    try:
+        yield con
+    finally:
+        await pool.release(con)
+
+
+async def read_fetch(query: str, *args) -> list[asyncpg.Record]:
+    # read-only queries: replica first, primary if there is no healthy replica
+    replica = bot.read_pool()
+    if replica is not None:
+        try:
+            async with db_conn(replica, timeout=replica_acquire_timeout) as con:
+                return await con.fetch(query, *args)
+        except database_busy:
+            # just saturated: this read goes to the primary, the replica stays in use
+            pass
+        except replica_errors as e:
+            bot.replica_failed(e)
+
+    async with db_conn() as con:
+        return await con.fetch(query, *args)
+
+
+async def read_fetchrow(query: str, *args) -> Optional[asyncpg.Record]:
+    rows = await read_fetch(query, *args)
+    return rows[0] if rows else None
+
+
+class balance_cache:
+    # lru of user_id -> balance. the bot's own writes put the committed balance here, so reads
+    # only hit the db for users nobody touched recently
+    def __init__(self, max_size: int, ttl_s: float):
+        self.max_size = max_size
+        self.ttl_s = ttl_s
+        self._data: OrderedDict[int, tuple[int, float]] = OrderedDict()
+        # bumped by every write; a db read that overlapped a write doesn't fill the cache,
+        # it may have seen the old balance (replica lag, or just ordering)
+        self.writes = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, user_id: int) -> Optional[int]:
+        hit = self._data.get(user_id)
+        if hit is None:
+            return None
+        # the age counts from the fill, reads don't extend it
+        if time.monotonic() - hit[1] > self.ttl_s:
+            del self._data[user_id]
+            return None
+        self._data.move_to_end(user_id)
+        return hit[0]
+
+    def _put(self, user_id: int, balance: int) -> None:
+        self._data[user_id] = (balance, time.monotonic())
+        self._data.move_to_end(user_id)
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+
+    def fill(self, user_id: int, balance: int, writes_seen: int) -> None:
+        if writes_seen == self.writes:
+            self._put(user_id, balance)
+
+    def write(self, balances: dict[int, int]) -> None:
+        self.writes += 1
+        for uid, bal in balances.items():
+            self._put(uid, bal)
+
+    def clear(self) -> None:
+        self.writes += 1
+        self._data.clear()
+
+
+credits_cache = balance_cache(credits_cache_size, credits_cache_ttl_s) if credits_cache_size > 0 else None
+
+
+async def get_credits(user_id: int) -> int:
+    if credits_cache is None:
+        return await store.get_credits(user_id)
+
+    cached = credits_cache.get(user_id)
+    if cached is not None:
+        return cached
+    writes_seen = credits_cache.writes
+    balance = await store.get_credits(user_id)
+    credits_cache.fill(user_id, balance, writes_seen)
+    return balance
+
+
+async def wipe_credits() -> None:
+    await store.wipe_credits()
+    if credits_cache is not None:
+        credits_cache.clear()
+
+
+async def set_credits(user_id: int, amount: int) -> int:
+    if bot.credit_agg is not None:
+        return await bot.credit_agg.submit(user_id, "set", amount)
+    return (await apply_credit_batch([(user_id, "set", amount)]))[0]
+
+
+async def add_credits(user_id: int, delta: int) -> int:
+    if bot.credit_agg is not None:
+        return await bot.credit_agg.submit(user_id, "add", delta)
+    return (await apply_credit_batch([(user_id, "add", delta)]))[0]
+
+
+async def sub_credits(user_id: int, delta: int) -> int:
+    if bot.credit_agg is not None:
+        return await bot.credit_agg.submit(user_id, "sub", delta)
+    return (await apply_credit_batch([(user_id, "sub", delta)]))[0]
+
+
+def apply_credit_op(balance: int, kind: str, amount: int) -> int:
+    if kind == "add":
+        return balance + amount
+    if kind == "sub":
+        # never below 0
+        return max(balance - amount, 0)
+    if kind == "set":
+        return amount
+    raise ValueError(f"unknown credit op: {kind}")
+
+
+def replay_credit_ops(
+    ops: list[tuple[int, str, int]], balances: dict[int, int]
+) -> tuple[list[int], list[tuple[int, str, int, int]]]:
+    # runs the ops over the starting balances (updated in place). returns the balance each op
+    # left behind and the ledger rows (user_id, kind, delta, balance) for ops that changed one
+    results: list[int] = []
+    ledger: list[tuple[int, str, int, int]] = []
+    for uid, kind, amount in ops:
+        uid = int(uid)
+        before = balances[uid]
+        after = apply_credit_op(before, kind, int(amount))
+        balances[uid] = after
+        results.append(after)
+        if after != before:
+            ledger.append((uid, kind, after - before, after))
+    return results, ledger
+
+
+async def apply_credit_batch(ops: list[tuple[int, str, int]]) -> list[int]:
+    # applies (user_id, kind, amount) ops in order and returns the balance each op left behind
+    results = await store.apply_credit_batch(ops)
+    if credits_cache is not None:
+        credits_cache.write({int(uid): bal for (uid, _, _), bal in zip(ops, results)})
+    return results
+
+
+class credit_aggregator:
+    # buffers add/sub calls for a few ms and writes them as one batch.
+    # flushes run one at a time, so while one is writing the next batch keeps filling up
+    def __init__(self, window_ms: float, max_batch: int):
+        self.window = max(window_ms, 0.0) / 1000
+        self.max_batch = max(max_batch, 1)
+        self._ops: list[tuple[int, str, int]] = []
+        self._futs: list[asyncio.Future] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._write_lock = asyncio.Lock()
+        self._tasks: set[asyncio.Task] = set()
+
+    def submit(self, user_id: int, kind: str, amount: int) -> asyncio.Future:
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+        self._ops.append((int(user_id), kind, int(amount)))
+        self._futs.append(fut)
+
+        if len(self._ops) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush)
+        return fut
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._ops:
+            return
+
+        ops, futs = self._ops, self._futs
+        self._ops, self._futs = [], []
+        task = asyncio.get_running_loop().create_task(self._write(ops, futs))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _write(self, ops: list[tuple[int, str, int]], futs: list[asyncio.Future]) -> None:
+        async with self._write_lock:
+            try:
+                results = await apply_credit_batch(ops)
+            except Exception as e:
+                for f in futs:
+                    if not f.done():
+                        f.set_exception(e)
+                return
+
+        for f, val in zip(futs, results):
+            if not f.done():
+                f.set_result(val)
+
+    async def close(self) -> None:
+        self._flush()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+
+async def period_leaderboard_rows(days: int) -> list:
+    since = datetime.now(timezone.utc).date() - timedelta(days=max(days, 1) - 1)
+    return await store.period_leaderboard_rows(since)
+
+
+async def credit_history_rows(user_id: int, days: int) -> list:
+    since = datetime.now(timezone.utc).date() - timedelta(days=max(days, 1) - 1)
+    return await store.credit_history_rows(user_id, since)
+
+
+# -------------------------
+# credit ledger partitions
+# -------------------------
+
+def ledger_partition_name(day: date) -> str:
+    return f"credit_ledger_{day:%Y%m%d}"
+
+
+async def ensure_ledger_partitions(con: asyncpg.Connection) -> None:
+    # one partition per utc day, from yesterday to days_ahead out.
+    # anything outside that lands in the default partition
+    today = datetime.now(timezone.utc).date()
+    for i in range(-1, credit_ledger_days_ahead + 1):
+        day = today + timedelta(days=i)
+        try:
+            await con.execute(
+                f"""
+                create table if not exists {ledger_partition_name(day)}
+                partition of credit_ledger
+                for values from ('{day.isoformat()} 00:00+00') to ('{(day + timedelta(days=1)).isoformat()} 00:00+00');
+                """
+            )
+        except asyncpg.PostgresError as e:
+            # e.g. the default partition already holds rows for that day
+            print(f"could not create ledger partition for {day}: {e}")
+
+
+async def detach_old_ledger_partitions(con: asyncpg.Connection) -> list[str]:
+    # detaching is a catalog change, the old day stays around as a plain table
+    if credit_ledger_keep_days <= 0:
+        return []
+    cutoff = ledger_partition_name(datetime.now(timezone.utc).date() - timedelta(days=credit_ledger_keep_days))
+    rows = await con.fetch(
+        """
+        select c.relname
+        from pg_inherits i
+        join pg_class c on c.oid = i.inhrelid
+        join pg_class p on p.oid = i.inhparent
+        where p.relname = 'credit_ledger' and c.relname ~ '^credit_ledger_[0-9]{8}$';
+        """
+    )
+    detached: list[str] = []
+    for r in rows:
+        name = str(r["relname"])
+        if name < cutoff:
+            await con.execute(f"alter table credit_ledger detach partition {name};")
+            detached.append(name)
+    return detached
+
+
+async def ledger_maintenance_loop() -> None:
+    while True:
+        try:
+            await store.maintenance()
+        except Exception as e:
+            print("ledger maintenance failed:", e)
+        await asyncio.sleep(6 * 3600)
+
+
+async def leaderboard_rows() -> list:
+    return await store.leaderboard_rows()
+
+
+async def get_user_roles(user_id: int) -> set[str]:
+    return await store.get_user_roles(user_id)
+
+
+def resolve_level_from_roles(roles: set[str]) -> str:
+    if "owners" in roles:
+        return "owners"
+    if "tag_manager" in roles:
+        return "tag_manager"
+    if "manager" in roles:
+        return "manager"
+    if "staff" in roles:
+        return "staff"
+    return "none"
+
+
+async def get_access_level(user_id: int) -> str:
+    if user_id in owner_ids:
+        return "owners"
+    roles = await get_user_roles(user_id)
+    return resolve_level_from_roles(roles)
+
+
+def member_role_ids(user: discord.abc.User) -> Optional[set[int]]:
+    # role ids sent with the interaction; None outside a guild (dms, user installs elsewhere)
+    if not isinstance(user, discord.Member):
+        return None
+    # the raw id list from the payload is there even when the guild isn't cached
+    ids = getattr(user, "_roles", None)
+    if ids is None:
+        ids = [r.id for r in user.roles]
+    return {int(i) for i in ids}
+
+
+async def get_interaction_access_level(interaction: discord.Interaction) -> str:
+    uid = int(interaction.user.id)
+    if uid in owner_ids:
+        return "owners"
+
+    # in our guild the member's discord roles decide, no db round trip
+    if access_role_levels and (not access_role_guild_id or interaction.guild_id == access_role_guild_id):
+        role_ids = member_role_ids(interaction.user)
+        if role_ids is not None:
+            return resolve_level_from_roles({access_role_levels[r] for r in role_ids if r in access_role_levels})
+
+    return await get_access_level(uid)
+
+
+def can_use_command(level: str, command: str) -> bool:
+    if command in {"credits", "creditsleaderboard", "creditstop", "credithistory"}:
+        return True
+
+    if command in {"role", "unrole", "roles", "rolecheck", "rolecensus", "export-roster"}:
+        return level in {"owners", "tag_manager"}
+
+    if level == "owners":
+        return True
+
+    if level == "manager":
+        return command not in {"whitelist", "unwhitelist", "wipe"}
+
+    if level == "staff":
+        return command not in {"setcredits", "whitelist", "unwhitelist", "wipe"}
+
+    return False
+
+
+async def send_reply(interaction: discord.Interaction, text: str, ephemeral: bool = True) -> None:
+    if interaction.response.is_done():
+        await interaction.followup.send(text, ephemeral=ephemeral)
+    else:
+        await interaction.response.send_message(text, ephemeral=ephemeral)
+
+
+async def require_access(interaction: discord.Interaction, command: str, ephemeral: bool = True) -> bool:
+    with trace_span("require_access", command=command):
+        level = await get_interaction_access_level(interaction)
+    if not can_use_command(level, command):
+        await send_reply(interaction, "you do not have permission to use this command.", ephemeral=ephemeral)
+        return False
+    return True
+
+
+async def charge_shared_limit(interaction: discord.Interaction, command: str) -> bool:
+    # call once the user is allowed and the arguments are valid, right before the expensive part
+    wait = bot.tree.throttle.charge_command(command)
+    if wait > 0:
+        await send_reply(
+            interaction, f"slow down, try `/{command}` again in {max(int(wait + 0.999), 1)}s.", ephemeral=True
+        )
+        return False
+    return True
+
+
+def role_choices() -> list[app_commands.Choice[str]]:
+    return [
+        app_commands.Choice(name="owners", value="owners"),
+        app_commands.Choice(name="manager", value="manager"),
+        app_commands.Choice(name="staff", value="staff"),
+        app_commands.Choice(name="tag_manager", value="tag_manager"),
+    ]
+
+
+async def ensure_roblox_roles_loaded(force: bool = False) -> None:
+    if not roblox_api_key:
+        return
+    if bot.rbx_http is None:
+        return
+    if bot._rbx_roles and not force:
+        return
+
+    # force: the caller acts on the role list, so check it with roblox even if the cached copy is fresh
+    roles = await roblox_list_roles(bot.rbx_http, revalidate=force)
+    bot._rbx_roles = roles
+    bot._rbx_roles_by_id = {r.role_id: r for r in roles}
+
+    lowest_rank: Optional[int] = None
+    lowest_role_id: Optional[int] = None
+
+    for r in roles:
+        if r.display_name.lower() == "guest":
+            continue
+        if r.rank is None or r.rank <= 0:
+            continue
+
+        if lowest_rank is None or r.rank < lowest_rank:
+            lowest_rank = r.rank
+            lowest_role_id = r.role_id
+
+    bot._rbx_lowest_assignable_role_id = lowest_role_id
+
+
+def rbx_role_info_by_id(role_id: int) -> tuple[str, str]:
+    r = bot._rbx_roles_by_id.get(int(role_id))
+    if r is None:
+        return "unknown", "unknown"
+    display = r.display_name or "unknown"
+    rank = str(r.rank) if r.rank else "unknown"
+    return display, rank
+
+
+class membership_prefetch:
+    # (invoker, typed target) -> background lookup of (user id, membership), started from
+    # autocomplete while the user is still picking a role. each entry is used at most once
+    def __init__(self, ttl_s: float, max_entries: int = 512):
+        self.ttl_s = ttl_s
+        self.max_entries = max_entries
+        self._entries: dict[tuple[int, str], tuple[float, asyncio.Task]] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _prune(self) -> None:
+        now = time.monotonic()
+        for key in [k for k, (exp, _) in self._entries.items() if exp <= now]:
+            del self._entries[key]
+        while len(self._entries) >= self.max_entries:
+            del self._entries[next(iter(self._entries))]
+
+    def start(self, interaction: discord.Interaction, raw: str) -> None:
+        key = (int(interaction.user.id), raw)
+        hit = self._entries.get(key)
+        if hit is not None and hit[0] > time.monotonic():
+            return
+        self._prune()
+        task = asyncio.create_task(self._lookup(interaction, raw))
+        # failures just mean the command looks it up itself
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        self._entries[key] = (time.monotonic() + self.ttl_s, task)
+
+    async def _lookup(self, interaction: discord.Interaction, raw: str):
+        # its own budget, not what is left of the autocomplete's
+        rbx_deadline.set(time.monotonic() + roblox_deadline_s)
+        rbx_priority.set(rbx_autocomplete)
+        if not can_use_command(await get_interaction_access_level(interaction), "role"):
+            return None
+        user_id = int(raw) if raw.isdigit() else await roblox_username_to_user_id(bot.rbx_http, raw)
+        if not user_id:
+            return None, None
+        return user_id, await roblox_get_membership(bot.rbx_http, user_id)
+
+    async def take(
+        self, user_id: int, raw: str
+    ) -> Optional[tuple[Optional[int], Optional[rbx_membership]]]:
+        # the prefetched (target user id, membership), waiting for it if still in flight;
+        # None if there is nothing usable. the prefetch runs at autocomplete priority, so it
+        # gets at most half of the caller's remaining budget and the rest is left for the
+        # command's own lookup
+        hit = self._entries.pop((int(user_id), raw), None)
+        now = time.monotonic()
+        if hit is None or hit[0] <= now:
+            return None
+        deadline = rbx_deadline.get()
+        wait_s = roblox_deadline_s if deadline is None else (deadline - now) / 2
+        if wait_s <= 0:
+            return None
+        try:
+            return await asyncio.wait_for(asyncio.shield(hit[1]), wait_s)
+        except Exception:
+            # still running (the command looks it up itself) or failed
+            return None
+
+
+rbx_prefetch = membership_prefetch(roblox_prefetch_ttl_s)
+
+
+async def ranking_autocomplete(interaction: discord.Interaction, current: str):
+    # /role: the id option is usually filled in before the role, start on the target now
+    if roblox_prefetch_ttl_s > 0 and roblox_api_key and bot.rbx_http is not None:
+        command = interaction.command.qualified_name if interaction.command else ""
+        raw = str(getattr(interaction.namespace, "id", "") or "").strip()
+        if command == "role" and raw:
+            rbx_prefetch.start(interaction, raw)
+
+    try:
+        await ensure_roblox_roles_loaded()
+    except Exception:
+        return []
+
+    current = (current or "").lower().strip()
+    out: list[app_commands.Choice[str]] = []
+
+    for r in bot._rbx_roles:
+        if not r.display_name:
+            continue
+
+        if current and current not in r.display_name.lower():
+            continue
+
+        out.append(app_commands.Choice(name=f"{r.display_name} ({r.role_id})", value=str(r.role_id)))
+        if len(out) >= 25:
+            break
+
+    return out
+
+
+async def send_role_log(interaction: discord.Interaction, text: str) -> None:
+    # logs even if the command was used in dms or outside a guild
+    try:
+        with trace_span("send_role_log"):
+            # without the guilds intent nothing is cached; a partial channel can still send
+            ch = interaction.client.get_channel(LOG_CHANNEL_ID)
+            if ch is None:
+                ch = interaction.client.get_partial_messageable(LOG_CHANNEL_ID)
+            await ch.send(text)
+    except Exception:
+        return
+
+async def roblox_list_memberships_page(
+    client: httpx.AsyncClient, page_token: str | None = None
+) -> tuple[list[rbx_membership], Optional[str]]:
+    params: dict[str, str] = {"maxPageSize": "100"}
+    if page_token:
+        params["pageToken"] = page_token
+
+    r = await rbx_send(
+        client,
+        "open_cloud",
+        "GET",
+        f"{ROBLOX_BASE}/groups/{ROBLOX_GROUP_ID}/memberships",
+        headers=roblox_headers(),
+        params=params,
+    )
+    r.raise_for_status()
+    data = rbx_json(r)
+    return memberships_from_page(data), (data.get("nextPageToken") or None)
+
+
+async def roblox_iter_memberships(client: httpx.AsyncClient):
+    page_token: str | None = None
+    while True:
+        items, page_token = await roblox_list_memberships_page(client, page_token)
+        for m in items:
+            yield m
+        if not page_token:
+            break
+
+
+# -------------------------
+# storage
+# -------------------------
+
+class postgres_store:
+    # asyncpg pools on bot.pool / bot.replica_pool; reads prefer the replica
+    name = "postgres"
+
+    async def open(self) -> None:
+        await ensure_schema_at(database_url)
+        bot.pool = await asyncpg.create_pool(database_url, **db_pool_kwargs())
+        if database_replica_url:
+            await bot.open_replica_pool()
+
+    async def close(self) -> None:
+        if bot.replica_pool:
+            await bot.replica_pool.close()
+        if bot.pool:
+            await bot.pool.close()
+
+    async def get_credits(self, user_id: int) -> int:
+        row = await read_fetchrow(sql_get_credits, user_id)
+        return int(row["credits"]) if row else 0
+
+    async def apply_credit_batch(self, ops: list[tuple[int, str, int]]) -> list[int]:
+        # one locking unnest upsert reads the starting balances, then one statement writes the new
+        # balances, the ledger rows and the daily rollups, so the cost is per batch, not per op
+        user_ids = sorted({int(uid) for uid, _, _ in ops})
+
+        async with db_conn() as con:
+            async with con.transaction():
+                # inserts missing users at 0 and row-locks everyone (sorted, so batches can't deadlock)
+                rows = await con.fetch(sql_lock_balances, user_ids)
+                balances = {int(r["user_id"]): int(r["credits"]) for r in rows}
+                results, ledger = replay_credit_ops(ops, balances)
+
+                await con.execute(
+                    sql_write_balances,
+                    list(balances.keys()),
+                    list(balances.values()),
+                    [row[0] for row in ledger],
+                    [row[1] for row in ledger],
+                    [row[2] for row in ledger],
+                    [row[3] for row in ledger],
+                )
+        return results
+
+    async def wipe_credits(self) -> None:
+        async with db_conn() as con:
+            await con.execute("delete from credits;")
+
+    async def leaderboard_rows(self) -> list:
+        return await read_fetch(sql_leaderboard)
+
+    async def period_leaderboard_rows(self, since: date) -> list:
+        return await read_fetch(
+            """
+            select user_id, sum(earned) as earned
+            from credit_daily
+            where day >= $1
+            group by user_id
+            having sum(earned) > 0
+            order by earned desc, user_id asc
+            limit 25;
+            """,
+            since,
+        )
+
+    async def credit_history_rows(self, user_id: int, since: date) -> list:
+        return await read_fetch(
+            """
+            select day, earned, spent
+            from credit_daily
+            where user_id = $1 and day >= $2
+            order by day desc;
+            """,
+            user_id,
+            since,
+        )
+
+    async def get_user_roles(self, user_id: int) -> set[str]:
+        rows = await read_fetch(sql_get_user_roles, user_id)
+        return {str(r["role"]) for r in rows}
+
+    async def whitelist_add(self, user_id: int, role: str) -> None:
+        async with db_conn() as con:
+            await con.execute(
+                """
+                insert into whitelist_roles (user_id, role)
+                values ($1, $2)
+                on conflict do nothing;
+                """,
+                user_id,
+                role,
+            )
+
+    async def whitelist_remove(self, user_id: int) -> int:
+        async with db_conn() as con:
+            res = await con.execute("delete from whitelist_roles where user_id = $1;", user_id)
+        return int(res.split()[-1])
+
+    async def whitelist_rows(self) -> list:
+        return await read_fetch(
+            """
+            select user_id, role
+            from whitelist_roles
+            order by user_id asc, role asc;
+            """
+        )
+
+    async def rank_targets(self) -> dict[int, int]:
+        rows = await read_fetch("select user_id, role_id from rank_targets;")
+        return {int(r["user_id"]): int(r["role_id"]) for r in rows}
+
+    async def maintenance(self) -> None:
+        async with db_conn() as con:
+            await ensure_ledger_partitions(con)
+            for name in await detach_old_ledger_partitions(con):
+                print(f"detached ledger partition {name}")
+
+
+sqlite_schema = """
+create table if not exists credits (
+    user_id integer primary key,
+    credits integer not null default 0
+);
+create table if not exists whitelist_roles (
+    user_id integer not null,
+    role text not null,
+    primary key (user_id, role)
+);
+create table if not exists credit_ledger (
+    id integer primary key autoincrement,
+    user_id integer not null,
+    kind text not null,
+    delta integer not null,
+    balance integer not null,
+    created_at text not null
+);
+create index if not exists credit_ledger_user_idx on credit_ledger (user_id, created_at);
+create index if not exists credit_ledger_created_idx on credit_ledger (created_at);
+create table if not exists credit_daily (
+    day text not null,
+    user_id integer not null,
+    earned integer not null default 0,
+    spent integer not null default 0,
+    primary key (day, user_id)
+);
+create index if not exists credit_daily_user_idx on credit_daily (user_id, day);
+create table if not exists rank_targets (
+    user_id integer primary key,
+    role_id integer not null
+);
+"""
+
+
+class sqlite_store:
+    # one local file in wal mode. reads run on their own connection in a worker thread; writes
+    # queue up for a single writer task, which commits whatever is queued as one transaction
+    name = "sqlite"
+
+    def __init__(self, path: str):
+        self.path = path
+        self.read_db: Optional[sqlite3.Connection] = None
+        self.write_db: Optional[sqlite3.Connection] = None
+        self.read_lock = threading.Lock()
+        self._queue: Optional[asyncio.Queue] = None
+        self._writer: Optional[asyncio.Task] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        db.row_factory = sqlite3.Row
+        db.execute("pragma journal_mode=wal;")
+        db.execute("pragma synchronous=normal;")
+        db.execute("pragma busy_timeout=5000;")
+        return db
+
+    def _open(self) -> None:
+        self.write_db = self._connect()
+        self.write_db.executescript(sqlite_schema)
+        self.read_db = self._connect()
+
+    async def open(self) -> None:
+        await asyncio.to_thread(self._open)
+        self._queue = asyncio.Queue()
+        self._writer = asyncio.create_task(self._write_loop())
+        print(f"sqlite storage ready at {self.path}")
+
+    async def close(self) -> None:
+        if self._writer is not None:
+            await self._queue.put(None)
+            await self._writer
+            self._writer = None
+        for db in (self.read_db, self.write_db):
+            if db is not None:
+                db.close()
+        self.read_db = self.write_db = None
+
+    def _read(self, query: str, args: tuple) -> list[sqlite3.Row]:
+        with self.read_lock:
+            return self.read_db.execute(query, args).fetchall()
+
+    async def fetch(self, query: str, *args) -> list[sqlite3.Row]:
+        with trace_span("sqlite.read", sql=sql_label(query)):
+            return await asyncio.to_thread(self._read, query, args)
+
+    async def write(self, fn):
+        # fn(db) runs on the writer connection inside the batch's transaction
+        if self._queue is None:
+            raise RuntimeError("sqlite storage is not open")
+        fut = asyncio.get_running_loop().create_future()
+        await self._queue.put((fn, fut))
+        with trace_span("sqlite.write"):
+            return await fut
+
+    async def _write_loop(self) -> None:
+        while True:
+            job = await self._queue.get()
+            if job is None:
+                return
+            jobs = [job]
+            stop = False
+            while len(jobs) < max(sqlite_write_batch, 1) and not self._queue.empty():
+                nxt = self._queue.get_nowait()
+                if nxt is None:
+                    stop = True
+                    break
+                jobs.append(nxt)
+
+            try:
+                results = await asyncio.to_thread(self._run_jobs, [fn for fn, _ in jobs])
+            except Exception as e:
+                results = [(False, e)] * len(jobs)
+            for (_, fut), (ok, val) in zip(jobs, results):
+                if fut.done():
+                    continue
+                if ok:
+                    fut.set_result(val)
+                else:
+                    fut.set_exception(val)
+            if stop:
+                return
+
+    def _run_jobs(self, fns: list) -> list[tuple[bool, object]]:
+        # one commit for the whole batch; a failing job only rolls back its own savepoint
+        db = self.write_db
+        out: list[tuple[bool, object]] = []
+        db.execute("begin immediate;")
+        try:
+            for fn in fns:
+                db.execute("savepoint job;")
+                try:
+                    out.append((True, fn(db)))
+                    db.execute("release job;")
+                except Exception as e:
+                    db.execute("rollback to job;")
+                    db.execute("release job;")
+                    out.append((False, e))
+            db.execute("commit;")
+        except Exception as e:
+            try:
+                db.execute("rollback;")
+            except Exception:
+                pass
+            return [(False, e)] * len(fns)
+        return out
+
+    async def get_credits(self, user_id: int) -> int:
+        rows = await self.fetch("select credits from credits where user_id = ?;", user_id)
+        return int(rows[0]["credits"]) if rows else 0
+
+    async def apply_credit_batch(self, ops: list[tuple[int, str, int]]) -> list[int]:
+        def run(db: sqlite3.Connection) -> list[int]:
+            user_ids = sorted({int(uid) for uid, _, _ in ops})
+            db.executemany("insert or ignore into credits (user_id, credits) values (?, 0);", [(u,) for u in user_ids])
+            balances: dict[int, int] = {}
+            for i in range(0, len(user_ids), 500):
+                chunk = user_ids[i:i + 500]
+                marks = ", ".join("?" * len(chunk))
+                for r in db.execute(f"select user_id, credits from credits where user_id in ({marks});", chunk):
+                    balances[int(r[0])] = int(r[1])
+
+            results, ledger = replay_credit_ops(ops, balances)
+            db.executemany(
+                "update credits set credits = ? where user_id = ?;", [(b, u) for u, b in balances.items()]
+            )
+
+            now = datetime.now(timezone.utc)
+            db.executemany(
+                "insert into credit_ledger (user_id, kind, delta, balance, created_at) values (?, ?, ?, ?, ?);",
+                [(uid, kind, delta, bal, now.isoformat()) for uid, kind, delta, bal in ledger],
+            )
+            daily: dict[int, list[int]] = {}
+            for uid, kind, delta, _ in ledger:
+                # set corrections aren't earnings or spending
+                if kind == "set":
+                    continue
+                sums = daily.setdefault(uid, [0, 0])
+                sums[0] += max(delta, 0)
+                sums[1] += max(-delta, 0)
+            db.executemany(
+                """
+                insert into credit_daily (day, user_id, earned, spent) values (?, ?, ?, ?)
+                on conflict (day, user_id) do update
+                set earned = earned + excluded.earned, spent = spent + excluded.spent;
+                """,
+                [(now.date().isoformat(), uid, e, sp) for uid, (e, sp) in daily.items()],
+            )
+            return results
+
+        return await self.write(run)
+
+    async def wipe_credits(self) -> None:
+        await self.write(lambda db: db.execute("delete from credits;").rowcount)
+
+    async def leaderboard_rows(self) -> list:
+        return await self.fetch(
+            """
+            select user_id, credits
+            from credits
+            where credits > 0
+            order by credits desc, user_id asc;
+            """
+        )
+
+    async def period_leaderboard_rows(self, since: date) -> list:
+        return await self.fetch(
+            """
+            select user_id, sum(earned) as earned
+            from credit_daily
+            where day >= ?
+            group by user_id
+            having sum(earned) > 0
+            order by earned desc, user_id asc
+            limit 25;
+            """,
+            since.isoformat(),
+        )
+
+    async def credit_history_rows(self, user_id: int, since: date) -> list:
+        rows = await self.fetch(
+            """
+            select day, earned, spent
+            from credit_daily
+            where user_id = ? and day >= ?
+            order by day desc;
+            """,
+            user_id,
+            since.isoformat(),
+        )
+        return [{"day": date.fromisoformat(r["day"]), "earned": r["earned"], "spent": r["spent"]} for r in rows]
+
+    async def get_user_roles(self, user_id: int) -> set[str]:
+        rows = await self.fetch("select role from whitelist_roles where user_id = ?;", user_id)
+        return {str(r["role"]) for r in rows}
+
+    async def whitelist_add(self, user_id: int, role: str) -> None:
+        await self.write(
+            lambda db: db.execute(
+                "insert or ignore into whitelist_roles (user_id, role) values (?, ?);", (user_id, role)
+            )
+        )
+
+    async def whitelist_remove(self, user_id: int) -> int:
+        return await self.write(
+            lambda db: db.execute("delete from whitelist_roles where user_id = ?;", (user_id,)).rowcount
+        )
+
+    async def whitelist_rows(self) -> list:
+        return await self.fetch("select user_id, role from whitelist_roles order by user_id asc, role asc;")
+
+    async def rank_targets(self) -> dict[int, int]:
+        rows = await self.fetch("select user_id, role_id from rank_targets;")
+        return {int(r["user_id"]): int(r["role_id"]) for r in rows}
+
+    async def maintenance(self) -> None:
+        # no partitions here; old ledger rows are just deleted
+        if credit_ledger_keep_days <= 0:
+            return
+        cutoff = (datetime.now(timezone.utc) - timedelta(days=credit_ledger_keep_days)).isoformat()
+        deleted = await self.write(
+            lambda db: db.execute("delete from credit_ledger where created_at < ?;", (cutoff,)).rowcount
+        )
+        if deleted:
+            print(f"deleted {deleted} old ledger rows")
+
+
+store = sqlite_store(sqlite_path) if storage_backend == "sqlite" else postgres_store()
+
+
+async def whitelist_add(user_id: int, role: str) -> None:
+    await store.whitelist_add(user_id, role)
+
+
+async def whitelist_remove(user_id: int) -> int:
+    return await store.whitelist_remove(user_id)
+
+
+async def whitelist_rows() -> list:
+    return await store.whitelist_rows()
+
+
+# -------------------------
+# credit ingestion api
+# -------------------------
+
+max_bigint = 2**63 - 1
+
+
+def parse_ingest_batch(body) -> list[tuple[int, str, int]]:
+    # [{"user_id": 1, "delta": 5}, ...] or {"updates": [...]} -> credit ops.
+    # negative deltas are subs, so the same floor at 0 applies as for /subcredits
+    items = body.get("updates") if isinstance(body, dict) else body
+    if not isinstance(items, list) or not items:
+        raise ValueError("expected a non-empty list of {user_id, delta}")
+    if len(items) > ingest_max_batch:
+        raise ValueError(f"at most {ingest_max_batch} updates per batch")
+
+    ops: list[tuple[int, str, int]] = []
+    for i, item in enumerate(items):
+        if not isinstance(item, dict):
+            raise ValueError(f"update {i} is not an object")
+        uid = item.get("user_id")
+        delta = item.get("delta")
+        if isinstance(uid, str) and uid.isdigit():
+            uid = int(uid)
+        if not isinstance(uid, int) or isinstance(uid, bool) or not 0 < uid <= max_bigint:
+            raise ValueError(f"update {i} has a bad user_id")
+        if not isinstance(delta, int) or isinstance(delta, bool) or abs(delta) > max_bigint:
+            raise ValueError(f"update {i} has a bad delta")
+        ops.append((uid, "add", delta) if delta >= 0 else (uid, "sub", -delta))
+    return ops
+
+
+def ingest_error(status: int, message: str) -> web.Response:
+    return web.json_response({"error": message}, status=status)
+
+
+async def handle_ingest(request: web.Request) -> web.Response:
+    # the scheme is case-insensitive, only the token needs a constant-time compare
+    scheme, _, token = request.headers.get("authorization", "").strip().partition(" ")
+    if scheme.lower() != "bearer" or not hmac.compare_digest(token.strip().encode(), ingest_token.encode()):
+        return ingest_error(401, "unauthorized")
+
+    try:
+        body = json_loads(await request.read())
+    except Exception:
+        return ingest_error(400, "body is not json")
+    try:
+        ops = parse_ingest_batch(body)
+    except ValueError as e:
+        return ingest_error(400, str(e))
+
+    # the whole batch is one transaction, one locking upsert and one write
+    try:
+        with trace_span("ingest", updates=len(ops)):
+            results = await apply_credit_batch(ops)
+    except database_busy as e:
+        return ingest_error(503, str(e))
+    except Exception as e:
+        print("credit ingest failed:", e)
+        return ingest_error(500, "could not apply batch")
+
+    return web.json_response(
+        {"results": [{"user_id": uid, "credits": bal} for (uid, _, _), bal in zip(ops, results)]}
+    )
+
+
+async def start_ingest_server() -> Optional[web.AppRunner]:
+    if not ingest_token:
+        print("ingest_port is set but ingest_token is empty, not starting the ingest api")
+        return None
+    app = web.Application(client_max_size=4 * 1024 * 1024)
+    app.router.add_post("/credits/batch", handle_ingest)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, ingest_host, ingest_port).start()
+    print(f"ingest api listening on {ingest_host}:{ingest_port}")
+    return runner
+
+
+# -------------------------
+# group snapshot
+# -------------------------
+
+def iso_to_epoch(raw: str) -> int:
+    if not raw or raw.startswith("0001-01-01"):
+        return 0
+    try:
+        return int(datetime.fromisoformat(raw.replace("Z", "+00:00")).timestamp())
+    except Exception:
+        return 0
+
+
+class member_snapshot:
+    # the whole group as three parallel int64 columns (user id, role id, update time).
+    # on disk: a fixed header followed by the raw columns, so loading is an mmap and a cast
+    header = struct.Struct("<4sBxxxqq")
+    magic = b"RSNP"
+
+    def __init__(self, user_ids, role_ids, updated, taken_at: int, backing: Optional[mmap.mmap] = None):
+        self.user_ids = user_ids
+        self.role_ids = role_ids
+        self.updated = updated
+        self.taken_at = taken_at
+        self._backing = backing
+
+    def __len__(self) -> int:
+        return len(self.user_ids)
+
+    def role_counts(self) -> Counter:
+        return Counter(self.role_ids)
+
+    def save(self, path: str) -> None:
+        tmp = f"{path}.tmp"
+        little = 1 if sys.byteorder == "little" else 0
+        with open(tmp, "wb") as f:
+            f.write(self.header.pack(self.magic, little, len(self), self.taken_at))
+            for col in (self.user_ids, self.role_ids, self.updated):
+                f.write(memoryview(col).cast("B"))
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str) -> Optional["member_snapshot"]:
+        try:
+            with open(path, "rb") as f:
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return None
+
+        if len(mm) < cls.header.size:
+            mm.close()
+            return None
+        magic, little, count, taken_at = cls.header.unpack_from(mm, 0)
+        if magic != cls.magic or little != (1 if sys.byteorder == "little" else 0):
+            mm.close()
+            return None
+        if len(mm) != cls.header.size + count * 8 * 3:
+            mm.close()
+            return None
+
+        view = memoryview(mm)
+        cols = []
+        for i in range(3):
+            start = cls.header.size + i * count * 8
+            cols.append(view[start:start + count * 8].cast("q"))
+        return cls(cols[0], cols[1], cols[2], taken_at, backing=mm)
+
+
+async def build_member_snapshot(client: httpx.AsyncClient) -> member_snapshot:
+    user_ids = array("q")
+    role_ids = array("q")
+    updated = array("q")
+    async for m in roblox_iter_memberships(client):
+        user_ids.append(m.user_id or 0)
+        role_ids.append(m.role_id or 0)
+        updated.append(iso_to_epoch(m.update_time))
+    return member_snapshot(user_ids, role_ids, updated, int(time.time()))
+
+
+async def refresh_member_snapshot() -> member_snapshot:
+    # one crawl at a time; concurrent callers share it
+    assert bot.rbx_http is not None
+    task = bot._rbx_snapshot_task
+    if task is None or task.done():
+        async def run() -> member_snapshot:
+            snap = await build_member_snapshot(bot.rbx_http)
+            await asyncio.to_thread(snap.save, roblox_snapshot_path)
+            bot.rbx_snapshot = snap
+            return snap
+
+        task = asyncio.create_task(run())
+        bot._rbx_snapshot_task = task
+    return await asyncio.shield(task)
+
+
+# -------------------------
+# roster export
+# -------------------------
+
+def roster_export_paths() -> tuple[str, str]:
+    name = f"roster_{ROBLOX_GROUP_ID}_{worker_id}" if worker_id else f"roster_{ROBLOX_GROUP_ID}"
+    base = os.path.join(roster_export_dir, name)
+    return f"{base}.csv", f"{base}.checkpoint.json"
+
+
+def write_json_atomic(path: str, data: dict) -> None:
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+
+
+async def export_roster_csv(client: httpx.AsyncClient, resume: bool = True) -> tuple[str, int, bool]:
+    # streams the group into a csv one page at a time, so memory stays flat at any group size.
+    # after every page the byte offset and next page token are checkpointed; a later call picks
+    # up from there. returns (csv path, rows, resumed)
+    csv_path, ckpt_path = roster_export_paths()
+
+    state: Optional[dict] = None
+    if resume and os.path.exists(csv_path) and os.path.exists(ckpt_path):
+        try:
+            with open(ckpt_path) as f:
+                state = json.load(f)
+        except Exception:
+            state = None
+
+    if state is not None:
+        f = open(csv_path, "r+b")
+        f.truncate(int(state["bytes"]))
+        f.seek(int(state["bytes"]))
+        page_token: Optional[str] = state["next_page_token"]
+        rows = int(state["rows"])
+    else:
+        f = open(csv_path, "wb")
+        f.write(b"user_id,role_id,role_name,update_time\r\n")
+        page_token = None
+        rows = 0
+
+    with f:
+        while True:
+            items, next_token = await roblox_list_memberships_page(client, page_token)
+
+            buf = io.StringIO()
+            writer = csv.writer(buf)
+            for m in items:
+                role = bot._rbx_roles_by_id.get(m.role_id) if m.role_id is not None else None
+                writer.writerow(
+                    [m.user_id or "", m.role_id or "", role.display_name if role else "", m.update_time]
+                )
+            f.write(buf.getvalue().encode("utf-8"))
+            f.flush()
+            rows += len(items)
+
+            if not next_token:
+                break
+            page_token = next_token
+            write_json_atomic(ckpt_path, {"next_page_token": page_token, "bytes": f.tell(), "rows": rows})
+
+    try:
+        os.remove(ckpt_path)
+    except FileNotFoundError:
+        pass
+    return csv_path, rows, state is not None
+
+
+def gzip_file(path: str) -> str:
+    out = f"{path}.gz"
+    with open(path, "rb") as src, gzip.open(out, "wb") as dst:
+        shutil.copyfileobj(src, dst, 1024 * 1024)
+    return out
+
+
+# -------------------------
+# rank reconciliation
+# -------------------------
+
+def parse_rank_targets(text: str) -> tuple[dict[int, int], int]:
+    # one "user_id,role" per line, role is a role id or a role name. returns (targets, bad lines)
+    by_name = {r.display_name.lower(): r.role_id for r in bot._rbx_roles if r.display_name}
+    targets: dict[int, int] = {}
+    bad = 0
+
+    for line in text.splitlines():
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        user_raw, _, role_raw = line.partition(",")
+        user_raw = user_raw.strip()
+        role_raw = role_raw.strip()
+        if not user_raw.isdigit():
+            # header row or junk
+            bad += 1
+            continue
+
+        role_id = int(role_raw) if role_raw.isdigit() else by_name.get(role_raw.lower())
+        if role_id is None:
+            bad += 1
+            continue
+        targets[int(user_raw)] = role_id
+
+    return targets, bad
+
+
+async def load_rank_targets_table() -> dict[int, int]:
+    return await store.rank_targets()
+
+
+async def plan_rank_changes(
+    client: httpx.AsyncClient, targets: dict[int, int]
+) -> tuple[list[tuple[str, int, Optional[int], int]], int, int]:
+    # one pass over the group; returns ([(membership_id, user_id, from_role, to_role)], scanned, not in group)
+    changes: list[tuple[str, int, Optional[int], int]] = []
+    seen = 0
+    scanned = 0
+    async for m in roblox_iter_memberships(client):
+        scanned += 1
+        if m.user_id is None:
+            continue
+        want = targets.get(m.user_id)
+        if want is None:
+            continue
+        seen += 1
+        if m.role_id != want and m.membership_id:
+            changes.append((m.membership_id, m.user_id, m.role_id, want))
+    return changes, scanned, len(targets) - seen
+
+
+async def apply_rank_changes(
+    client: httpx.AsyncClient, changes: list[tuple[str, int, Optional[int], int]]
+) -> tuple[int, int]:
+    sem = asyncio.Semaphore(max(reconcile_concurrency, 1))
+
+    async def one(membership_id: str, from_role: Optional[int], role_id: int) -> bool:
+        async with sem:
+            try:
+                await rbx_rank_changes.set_role(client, membership_id, role_id, from_role)
+                return True
+            except Exception:
+                return False
+
+    results = await asyncio.gather(*(one(mid, frm, to) for mid, _uid, frm, to in changes))
+    ok = sum(1 for r in results if r)
+    return ok, len(results) - ok
+
+
+# -------------------------
+# bot-level commands (not in a cog, so they survive reloads)
+# -------------------------
+
+@bot.tree.command(name="reload", description="hot-reload command code without restarting (owners only)")
+@app_commands.allowed_installs(guilds=True, users=True)
+@app_commands.allowed_contexts(guilds=True, dms=True, private_channels=True)
+@app_commands.describe(extension="which command group to reload", sync="also re-sync slash commands with discord")
+@app_commands.choices(
+    extension=[
+        app_commands.Choice(name="all", value="all"),
+        app_commands.Choice(name="roblox", value="cogs.roblox"),
+        app_commands.Choice(name="credits", value="cogs.credits"),
+        app_commands.Choice(name="whitelist", value="cogs.whitelist"),
+        app_commands.Choice(name="admin", value="cogs.admin"),
+    ]
+)
+async def reload_cmd(interaction: discord.Interaction, extension: app_commands.Choice[str], sync: bool = False):
+    # owners only, hard stop
+    level = await get_interaction_access_level(interaction)
+    if level != "owners":
+        await interaction.response.send_message("you do not have permission to use this command.", ephemeral=True)
+        return
+
+    await interaction.response.defer(thinking=True, ephemeral=True)
+
+    names = initial_extensions if extension.value == "all" else (extension.value,)
+    done: list[str] = []
+    try:
+        for name in names:
+            # on failure discord.py keeps the old version loaded
+            await bot.reload_extension(name)
+            done.append(name)
+    except commands.ExtensionError as e:
+        bot.refresh_guild_commands()
+        await interaction.followup.send(f"reload failed on `{e.name}`: {e}", ephemeral=True)
+        return
+
+    if sync:
+        await bot.sync_commands()
+    else:
+        bot.refresh_guild_commands()
+
+    await interaction.followup.send(
+        f"reloaded {', '.join(f'`{n}`' for n in done)}" + (" and synced commands." if sync else "."),
+        ephemeral=True,
+    )
+
+
+@bot.tree.error
+async def on_app_command_error(interaction: discord.Interaction, error: app_commands.AppCommandError):
+    original = getattr(error, "original", error)
+    if isinstance(original, (roblox_unavailable, database_busy)):
+        try:
+            await send_reply(interaction, str(original), ephemeral=True)
+        except Exception:
+            pass
+        return
+    await app_commands.CommandTree.on_error(bot.tree, interaction, error)
+
+
+@bot.event
+async def on_ready():
+    print(f"logged in as {bot.user} ({bot.user.id})")
+
+
+# -------------------------
+# http interactions mode
+# -------------------------
+
+def interaction_verifier(public_key_hex: str):
+    # ed25519 check of timestamp + body against the app's public key (pynacl, or cryptography)
+    key_bytes = bytes.fromhex(public_key_hex)
+    try:
+        from nacl.exceptions import BadSignatureError
+        from nacl.signing import VerifyKey
+    except ImportError:
+        pass
+    else:
+        key = VerifyKey(key_bytes)
+
+        def verify(message: bytes, signature: bytes) -> bool:
+            try:
+                key.verify(message, signature)
+                return True
+            except BadSignatureError:
+                return False
+
+        return verify
+
+    try:
+        from cryptography.exceptions import InvalidSignature
+        from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PublicKey
+    except ImportError:
+        return None
+    pub = Ed25519PublicKey.from_public_bytes(key_bytes)
+
+    def verify(message: bytes, signature: bytes) -> bool:
+        try:
+            pub.verify(signature, message)
+            return True
+        except InvalidSignature:
+            return False
+
+    return verify
+
+
+class http_reply:
+    # the initial response of one webhook interaction. it goes back as the http response body,
+    # and the command only continues (followups etc.) once discord has it
+    def __init__(self):
+        self.payload: asyncio.Future = asyncio.get_running_loop().create_future()
+        self.sent = asyncio.Event()
+
+
+http_replies: dict[int, http_reply] = {}
+
+
+def install_http_interaction_responses() -> None:
+    # discord.py sends the initial response to the callback endpoint; in http mode it is
+    # handed to the waiting webhook request instead
+    from discord.webhook.async_ import AsyncWebhookAdapter
+
+    if getattr(AsyncWebhookAdapter.create_interaction_response, "_http_mode", False):
+        return
+    original = AsyncWebhookAdapter.create_interaction_response
+
+    async def create_interaction_response(self, interaction_id, token, *args, **kwargs):
+        reply = http_replies.get(int(interaction_id))
+        params = kwargs.get("params")
+        if reply is None or reply.payload.done() or (params is not None and params.files):
+            # too late for the http response, or attachments: use the callback endpoint
+            return await original(self, interaction_id, token, *args, **kwargs)
+
+        if params is not None:
+            payload = params.payload
+        else:
+            payload = {"type": kwargs.get("type")}
+            if kwargs.get("data") is not None:
+                payload["data"] = kwargs["data"]
+        reply.payload.set_result(payload)
+        try:
+            await asyncio.wait_for(reply.sent.wait(), 5)
+        except asyncio.TimeoutError:
+            pass
+
+    create_interaction_response._http_mode = True
+    AsyncWebhookAdapter.create_interaction_response = create_interaction_response
+
+
+def make_interactions_app(verify) -> web.Application:
+    async def handle(request: web.Request) -> web.StreamResponse:
+        body = await request.read()
+        timestamp = request.headers.get("x-signature-timestamp", "")
+        try:
+            signature = bytes.fromhex(request.headers.get("x-signature-ed25519", ""))
+        except ValueError:
+            signature = b""
+        if not signature or not timestamp or not verify(timestamp.encode() + body, signature):
+            return web.Response(status=401, text="invalid request signature")
+
+        try:
+            data = json_loads(body)
+        except Exception:
+            return web.Response(status=400, text="bad json")
+        if not isinstance(data, dict):
+            return web.Response(status=400, text="bad json")
+
+        # ping
+        if data.get("type") == 1:
+            return web.json_response({"type": 1})
+
+        interaction_id = int(data["id"])
+        reply = http_reply()
+        http_replies[interaction_id] = reply
+        try:
+            # same path as a gateway INTERACTION_CREATE: the tree runs the command in a task
+            bot._connection.parse_interaction_create(data)
+            try:
+                # discord gives up after 3s
+                payload = await asyncio.wait_for(asyncio.shield(reply.payload), 2.8)
+            except asyncio.TimeoutError:
+                print(f"interaction {interaction_id} was not answered in time")
+                return web.Response(status=500, text="no response")
+
+            resp = web.json_response(payload)
+            await resp.prepare(request)
+            await resp.write_eof()
+            return resp
+        finally:
+            reply.sent.set()
+            http_replies.pop(interaction_id, None)
+
+    async def health(request: web.Request) -> web.Response:
+        return web.Response(text="ok")
+
+    app = web.Application()
+    app.router.add_post("/interactions", handle)
+    app.router.add_get("/healthz", health)
+    return app
+
+
+async def run_interactions_server() -> None:
+    # no gateway: login (rest only, runs setup_hook) and serve the webhook. several workers can
+    # sit behind a load balancer, but see skip_command_sync for what each of them keeps to itself
+    if not discord_public_key:
+        raise RuntimeError("missing discord_public_key (needed for interactions_port)")
+    verify = interaction_verifier(discord_public_key)
+    if verify is None:
+        raise RuntimeError("http interactions need PyNaCl or cryptography installed")
+
+    async with bot:
+        install_http_interaction_responses()
+        await bot.login(token)
+        runner = web.AppRunner(make_interactions_app(verify), access_log=None)
+        await runner.setup()
+        await web.TCPSite(runner, interactions_host, interactions_port).start()
+        print(f"serving interactions on {interactions_host}:{interactions_port}")
+        try:
+            await asyncio.Event().wait()
+        finally:
+            await runner.cleanup()
+
+
+# -------------------------
+# memory diagnostics
+# -------------------------
+
+def process_rss_bytes() -> Optional[int]:
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    # peak, not current, where /proc isn't available (kb on linux, bytes on macos)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def bot_cache_sizes() -> dict[str, int]:
+    throttle = bot.tree.throttle
+    sizes = {
+        "discord users": len(bot.users),
+        "discord guilds": len(bot.guilds),
+        "discord messages": len(bot.cached_messages),
+        "throttle users": len(throttle.users),
+        "throttle commands": len(throttle.commands),
+        "credit balances": len(credits_cache) if credits_cache is not None else 0,
+        "roblox roles": len(bot._rbx_roles),
+        "roblox latency windows": sum(len(w.samples) for w in rbx_latency.values()),
+        "roblox queued requests": rbx_sched.waiting(),
+        "roblox membership prefetches": len(rbx_prefetch),
+        "roblox usernames": len(rbx_names),
+        "roblox known ranks": len(rbx_rank_changes),
+        "group snapshot members": len(bot.rbx_snapshot) if bot.rbx_snapshot is not None else 0,
+    }
+    if rbx_http_cache is not None and rbx_http_cache.db is not None:
+        try:
+            sizes["roblox http cache bytes"] = os.path.getsize(rbx_http_cache.path)
+        except OSError:
+            pass
+    return sizes
+
+
+def tracemalloc_top(limit: int = 10) -> list[tuple[str, int, int]]:
+    # (file:line, bytes, blocks), biggest first
+    snap = tracemalloc.take_snapshot().filter_traces(
+        (tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, "<frozen importlib._bootstrap>"))
+    )
+    out: list[tuple[str, int, int]] = []
+    for stat in snap.statistics("lineno")[:limit]:
+        frame = stat.traceback[0]
+        out.append((f"{frame.filename}:{frame.lineno}", stat.size, stat.count))
+    return out
+
+
+def install_fast_loop() -> None:
+    try:
+        import uvloop
+    except ImportError:
+        print("fast_runtime: uvloop not installed, using asyncio")
+        return
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    print("fast_runtime: uvloop enabled")
+
+
+def main():
+    if not token:
+        raise RuntimeError("missing discord_token")
+    if storage_backend not in {"postgres", "sqlite"}:
+        raise RuntimeError(f"unknown storage_backend: {storage_backend}")
+    if storage_backend == "postgres" and not database_url:
+        raise RuntimeError("missing database_url")
+    if fast_runtime:
+        install_fast_loop()
+    if debug_tracemalloc:
+        tracemalloc.start()
+    if interactions_port > 0:
+        try:
+            asyncio.run(run_interactions_server())
+        except KeyboardInterrupt:
+            pass
+        return
+    bot.run(token)